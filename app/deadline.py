@@ -0,0 +1,74 @@
+# Latency budget for interaction handlers.
+# Discord drops an interaction that isn't acknowledged within 3 seconds. Upstream work is raced against that
+# budget: if it isn't done in time the interaction is deferred and answered with a follow-up, and if upstream
+# misses the (longer) follow-up deadline too, the last known cached payload is used instead.
+
+import asyncio
+import os
+
+import discord
+from discord import Interaction
+
+from scripts.upstreamScheduler import INTERACTIVE, upstreamLane
+
+INTERACTION_DEADLINE = 3.0  # seconds Discord gives us to acknowledge an interaction
+DEFER_MARGIN = float(os.getenv("DEFER_MARGIN", "0.8"))  # acknowledge this long before the deadline at the latest
+FOLLOWUP_DEADLINE = float(os.getenv("FOLLOWUP_DEADLINE", "10"))  # total time to wait for upstream once deferred
+
+DEADLINE_MISSED = 504
+
+def remainingBudget(interaction: Interaction):
+    # Time left before we must acknowledge, measured from when Discord created the interaction
+    elapsed = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+    return max(0.0, min(INTERACTION_DEADLINE, INTERACTION_DEADLINE - elapsed) - DEFER_MARGIN)
+
+async def defer(interaction: Interaction, edit: bool):
+    if interaction.response.is_done():
+        return
+    if edit:
+        # Component click that will edit its own message: acknowledge without a "thinking" placeholder
+        await interaction.response.defer()
+    else:
+        await interaction.response.defer(thinking=True)
+
+async def fetchWithinDeadline(interaction: Interaction, fetch, fallback=None, edit=False, label="request"):
+    # fetch: awaitable returning (status, data). fallback: callable returning stale data or None.
+    # Returns (status, data), deferring the interaction if upstream is too slow to answer directly.
+    # Its upstream requests go out in the interactive lane under the interaction's guild, ahead of prefetches.
+    with upstreamLane(INTERACTIVE, interaction.guild_id):
+        task = asyncio.ensure_future(fetch)
+        budget = remainingBudget(interaction)
+
+        done, _ = await asyncio.wait({task}, timeout=budget)
+        if not done:
+            print(f"⏳ {label} is slow, deferring interaction")
+            await defer(interaction, edit)
+            done, _ = await asyncio.wait({task}, timeout=max(0.0, FOLLOWUP_DEADLINE - budget))
+
+        if done:
+            try:
+                return task.result()
+            except Exception as e:
+                print(f"⚠️ {label} failed: {type(e).__name__}: {str(e)}")
+        else:
+            print(f"⚠️ {label} missed the {FOLLOWUP_DEADLINE:g}s deadline")
+            # Let it finish in the background (it still warms the cache), but don't leave its error unretrieved
+            task.add_done_callback(lambda late: late.cancelled() or late.exception())
+
+        stale = fallback() if fallback is not None else None
+        if stale is not None:
+            print(f"🔄 Serving cached data for {label}")
+            return 200, stale
+        return DEADLINE_MISSED, None
+
+async def respond(interaction: Interaction, edit=False, **kwargs):
+    # Answer through whichever channel is still open: the initial response, or the follow-up after a defer
+    if not interaction.response.is_done():
+        if edit:
+            await interaction.response.edit_message(**kwargs)
+        else:
+            await interaction.response.send_message(**kwargs)
+    elif edit:
+        await interaction.edit_original_response(**kwargs)
+    else:
+        await interaction.followup.send(**kwargs)
@@ -1,116 +1,137 @@
 import discord
-import aiohttp
-import os
 
-from discord.ui import Button, View
+from discord.ui import Button, DynamicItem, View
 from discord import ButtonStyle, Embed, Interaction, app_commands
 
-from scripts.playerNameFetcher import getCachedPlayerMappingSync
+from scripts.playerNameFetcher import getPlayerIndex
+from scripts.detailFetcher import fetchPlayerDetail, peekDetail
+from scripts.entityStore import entityStore
+from scripts.prefetcher import prefetcher
+from app.snapshots import PlayerSnapshot
+from app.deadline import fetchWithinDeadline, respond
+from scripts.metrics import autocompleteLatency, buttonLatency
+from scripts.executors import AUTOCOMPLETE_OFFLOAD_MIN, runIo
 
-API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:5000")
+class PlayerTeamButton(DynamicItem[Button], template=r"vct:player-team:(?P<team_id>\d+)"):
+    # Stateless "View Team" button: the team ID is carried in the custom_id, so clicks keep working after a
+    # restart and the bot holds nothing per message (0 means the player has no team)
+    def __init__(self, team_id: int):
+        super().__init__(Button(label="View Team 📅", style=ButtonStyle.green, custom_id=f"vct:player-team:{team_id}"))
+        self.team_id = team_id
+
+    @classmethod
+    async def from_custom_id(cls, interaction: Interaction, item: Button, match):
+        return cls(int(match["team_id"]))
+
+    async def callback(self, interaction: Interaction):
+        with buttonLatency.time(button="player_team"):
+            if not self.team_id:
+                await interaction.response.send_message("❌ Error: No team found for this player.")
+                return
+            from app.teamInfo import teamInfoById
+            await teamInfoById(interaction, self.team_id)
 
 class PlayerView(View):
-    def __init__(self, player_data, player_id):
+    def __init__(self, player: PlayerSnapshot, rosters=()):
         super().__init__(timeout=None)
-        self.player_data = player_data
-        self.player_id = player_id
-        self.player_user_name = player_data["data"]["info"]["user"]
-        self.player_name = player_data["data"]["info"]["name"]
-        self.player_image = player_data["data"]["info"]["img"]
-        self.player_url = player_data["data"]["info"]["url"]
-        self.player_team_name = player_data["data"]["team"]["name"]
-        self.player_team_id = player_data["data"]["team"].get("id", None)
-        self.player_team_joined = player_data["data"]["team"]["joined"]
-        self.player_country = player_data["data"]["info"]["flag"]
-        self.player_socials = player_data["data"]["socials"]
+        # Only used to render the embed; the one interactive item is a PlayerTeamButton, so discord.py
+        # doesn't keep this view (or the snapshot) alive after the message is sent
+        self.player = player
+        self.player_id = player.player_id
+        self.player_team_id = player.team_id
+        # Other teams whose roster lists this player (from the entity store)
+        self.rosters = [team for team in rosters if str(team["id"]) != str(player.team_id)]
+
+        self.add_item(PlayerTeamButton(int(self.player_team_id or 0)))
     
     def create_player_embed(self):
         embed = Embed(
-            title=f"{self.player_user_name}",
-            url=self.player_url,
+            title=f"{self.player.user}",
+            url=self.player.url,
             color=discord.Color.blue()
         )
 
-        if self.player_image:
-            embed.set_thumbnail(url=self.player_image)
+        if self.player.img:
+            embed.set_thumbnail(url=self.player.img)
         
-        country_text = f":flag_{self.player_country.lower()}:" if self.player_country else "Unknown"
+        country_text = f":flag_{self.player.flag.lower()}:" if self.player.flag else "Unknown"
         
-        description = f"**Name:** {self.player_name}\n"
-        description += f"**Team:** {self.player_team_name}\n"
-        description += f"**Team Joined:** {self.player_team_joined}\n"
+        description = f"**Name:** {self.player.name}\n"
+        description += f"**Team:** {self.player.team_name}\n"
+        description += f"**Team Joined:** {self.player.team_joined}\n"
+        if self.rosters:
+            description += f"**Also on:** {', '.join(team['name'] for team in self.rosters[:5])}\n"
         description += f"**Country:** {country_text}\n"
         
         embed.description = description
 
-        if self.player_socials and "twitter_url" in self.player_socials and self.player_socials["twitter_url"]:
+        if self.player.twitter_url:
             self.add_item(Button(
                 style=ButtonStyle.url,
                 label="🐦 X",
-                url=self.player_socials["twitter_url"],
+                url=self.player.twitter_url,
             )
         )
         
-        if self.player_socials and "twitch_url" in self.player_socials and self.player_socials["twitch_url"]:
+        if self.player.twitch_url:
             self.add_item(Button(
                 style=ButtonStyle.url,
                 label="📺 Twitch",
-                url=self.player_socials["twitch_url"],
+                url=self.player.twitch_url,
             )
         )
         
         self.add_item(Button(
             style=ButtonStyle.url,
             label="VLR",
-            url=self.player_url
+            url=self.player.url
         ))
 
         embed.set_footer(text=f"Player ID: {self.player_id}")
         
         return embed
-    
-    @discord.ui.button(label="View Team 📅", style=ButtonStyle.green, custom_id="view_team_from_player")
-    async def view_team_button(self, interaction: Interaction, button: Button):
-        if (self.player_team_id is None) or (self.player_team_id == 0):
-            await interaction.response.send_message("❌ Error: No team found for this player.")
-            return
-        from app.teamInfo import teamInfoById
-        await teamInfoById(interaction, self.player_team_id)
-        
+
 async def playerInfoById(interaction: Interaction, player_id: int):
-    url = f"{API_BASE_URL}/api/v1/players/{player_id}"
-    
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            if response.status == 200:
-                # Get team data
-                player_data = await response.json()
-                
-                # Create the view and embed
-                view = PlayerView(player_data, player_id)
-                embed = view.create_player_embed()
-                
-                # Send the initial message
-                await interaction.response.send_message(embed=embed, view=view)
-            else:
-                await interaction.response.send_message(f"❌ Error: Unable to fetch data for team ID {player_id} (status code {response.status})")
+    status, player = await fetchWithinDeadline(
+        interaction, fetchPlayerDetail(player_id), fallback=lambda: peekDetail("players", player_id), label=f"player {player_id}"
+    )
 
-async def playerNameAutocomplete(interaction: discord.Interaction, current: str) -> list[app_commands.Choice[int]]:
-    # Get the player mappings
-    _, players_list = getCachedPlayerMappingSync()
-    
-    # Filter players by the current input
-    filtered_players = []
-    
-    # If there's input, filter players that contain the input string (case insensitive)
-    if current:
-        current_lower = current.lower()
-        filtered_players = [
-            player for player in players_list 
-            if current_lower in player["name"].lower()
-        ][:25]  # Discord limits choices to 25
+    if status == 200:
+        # Create the view and embed
+        view = PlayerView(player, await runIo(entityStore.playerTeams, player.player_id))
+        embed = view.create_player_embed()
+        
+        # Send the initial message
+        await respond(interaction, embed=embed, view=view)
+
+        # "View Team" is the usual next click
+        prefetcher.schedule("teams", player.team_id)
     else:
-        filtered_players = players_list[:25]
+        await respond(interaction, content=f"❌ Error: Unable to fetch data for team ID {player_id} (status code {status})")
+
+def addStorePlayers(filtered_players, players):
+    # The index only knows handles; fill the remaining slots from real-name matches in the entity store
+    seen = {str(player["id"]) for player in filtered_players}
+    for player in players:
+        if player["id"] not in seen and len(filtered_players) < 25:
+            label = f"{player['name']} ({player['realName']})" if player["realName"] else player["name"]
+            filtered_players.append({"name": label[:100], "id": player["id"]})
+            seen.add(player["id"])
+    return filtered_players
+
+async def playerNameAutocomplete(interaction: discord.Interaction, current: str) -> list[app_commands.Choice[int]]:
+    # Ranked lookup in the resident name index (exact > prefix > word-prefix > fuzzy). Large indexes are searched
+    # on a thread (the index is never mutated, so that's safe) to keep the loop free.
+    index = getPlayerIndex()
+    with autocompleteLatency.time(kind="player"):
+        if len(index) >= AUTOCOMPLETE_OFFLOAD_MIN:
+            filtered_players = await runIo(index.search, current, 25)  # Discord limits choices to 25
+        else:
+            filtered_players = index.search(current, 25)
+
+        # The entity store lookup is a SQLite read, so it always runs on a thread
+        if current and len(filtered_players) < 25:
+            addStorePlayers(filtered_players, await runIo(entityStore.searchPlayers, current, 25))
     
     # Convert to Discord choices format
     choices = [
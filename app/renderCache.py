@@ -0,0 +1,36 @@
+# Memoized embeds / views per (entity, tab), tied to the snapshot version they were rendered from.
+# A detail cache refresh produces a new snapshot with a new version, which makes the old rendering miss and be
+# replaced on the next lookup.
+
+import os
+from collections import OrderedDict
+
+RENDER_CACHE_MAX_ENTRIES = int(os.getenv("RENDER_CACHE_MAX_ENTRIES", "1024"))
+
+class RenderCache:
+    def __init__(self, maxEntries=RENDER_CACHE_MAX_ENTRIES):
+        self.maxEntries = maxEntries
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, version):
+        cached = self.entries.get(key)
+        if cached is None:
+            return None
+        if cached[0] != version:
+            # Rendered from an older snapshot
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return cached[1]
+
+    def set(self, key, version, rendered):
+        self.entries[key] = (version, rendered)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxEntries:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, key):
+        self.entries.pop(key, None)
@@ -0,0 +1,163 @@
+# Compact, read-only snapshots of the team / player detail payloads.
+# The raw JSON is parsed once when it is fetched and only the fields the embeds use are kept. The detail
+# cache holds one snapshot per entity, and every view of that entity shares it.
+
+import sys
+from itertools import count
+from typing import NamedTuple
+
+from scripts.detailFetcher import addDetailListener, registerDetailParser
+from scripts.entityStore import entityStore
+from scripts.scheduleIndex import parseMatchTime
+
+class RosterMember(NamedTuple):
+    user: str
+    name: str
+    url: str
+    tag: str
+
+class UpcomingMatch(NamedTuple):
+    url: str
+    event: str
+    team1: str
+    team2: str
+    start: int | None  # epoch seconds, parsed once here; None when upstream has no time yet
+
+# Every snapshot gets a new version, so anything derived from one (e.g. rendered embeds) can tell it is outdated
+_versions = count(1)
+
+def _roster(members):
+    return tuple(
+        RosterMember(member["user"], member["name"], member.get("url", "#"), member.get("tag", "Unknown"))
+        for member in members if "name" in member and "user" in member
+    )
+
+def _upcoming(matches):
+    return tuple(
+        UpcomingMatch(
+            match["match"]["url"],
+            match["event"]["name"],
+            match["teams"][0]["tag"],
+            match["teams"][1]["tag"],
+            parseMatchTime(match.get("utc")),
+        )
+        for match in matches
+    )
+
+def parseUpcoming(team_data):
+    # Just the upcoming matches of a raw team payload, for building the schedule without a full snapshot
+    return _upcoming(team_data["data"].get("upcoming", []))
+
+def _resultRow(event, tag1, tag2, points1, points2):
+    # Results are only ever shown as these fixed-width rows, so each one is formatted once here and the
+    # results tab pages through them as they are
+    score = f"{points1}-{points2}".center(5)
+    match_text = f"{score} · {tag1[:5].strip()} vs {tag2[:5].strip()}"
+    return f"{match_text.ljust(20)}| {event[:22]}"
+
+def _results(matches):
+    return tuple(
+        _resultRow(
+            match["event"]["name"] or "N/A",
+            match["teams"][0].get("tag") or "N/A",
+            match["teams"][1].get("tag") or "N/A",
+            match["teams"][0].get("points") or 0,
+            match["teams"][1].get("points") or 0,
+        )
+        for match in matches
+    )
+
+def _sizeOf(value):
+    # Rough deep size of the tuples/strings a snapshot is made of, for the detail cache's byte budget
+    size = sys.getsizeof(value)
+    if isinstance(value, tuple):
+        size += sum(_sizeOf(item) for item in value)
+    return size
+
+class TeamSnapshot:
+    __slots__ = ("version", "team_id", "name", "logo", "players", "staff", "upcoming", "results")
+
+    def __init__(self, team_id, name, logo, players, staff, upcoming, results):
+        self.version = next(_versions)
+        self.team_id = team_id
+        self.name = name
+        self.logo = logo
+        self.players = players
+        self.staff = staff
+        self.upcoming = upcoming
+        self.results = results
+
+    @classmethod
+    def fromPayload(cls, team_id, team_data):
+        data = team_data["data"]
+        return cls(
+            team_id,
+            data["info"]["name"],
+            data["info"].get("logo", None),
+            _roster(data.get("players", [])),
+            _roster(data.get("staff", [])),
+            _upcoming(data.get("upcoming", [])),
+            _results(data.get("results", [])),
+        )
+
+    def approxSize(self):
+        return sys.getsizeof(self) + sum(_sizeOf(getattr(self, slot)) for slot in self.__slots__)
+
+class PlayerSnapshot:
+    __slots__ = (
+        "version", "player_id", "user", "name", "img", "url", "flag",
+        "team_name", "team_id", "team_joined", "twitter_url", "twitch_url",
+    )
+
+    def __init__(self, player_id, user, name, img, url, flag, team_name, team_id, team_joined, twitter_url, twitch_url):
+        self.version = next(_versions)
+        self.player_id = player_id
+        self.user = user
+        self.name = name
+        self.img = img
+        self.url = url
+        self.flag = flag
+        self.team_name = team_name
+        self.team_id = team_id
+        self.team_joined = team_joined
+        self.twitter_url = twitter_url
+        self.twitch_url = twitch_url
+
+    @classmethod
+    def fromPayload(cls, player_id, player_data):
+        data = player_data["data"]
+        socials = data.get("socials") or {}
+        return cls(
+            player_id,
+            data["info"]["user"],
+            data["info"]["name"],
+            data["info"]["img"],
+            data["info"]["url"],
+            data["info"]["flag"],
+            data["team"]["name"],
+            data["team"].get("id", None),
+            data["team"]["joined"],
+            socials.get("twitter_url"),
+            socials.get("twitch_url"),
+        )
+
+    def approxSize(self):
+        return sys.getsizeof(self) + sum(sys.getsizeof(getattr(self, slot)) for slot in self.__slots__)
+
+def recordTeam(team_id, team):
+    # Logo and roster go into the entity store in the background
+    entityStore.submit(
+        entityStore.upsertTeamDetail, team_id, team.name, team.logo,
+        [(member.user, member.url, member.tag) for member in team.players],
+        [(member.user, member.url, member.tag) for member in team.staff],
+    )
+
+def recordPlayer(player_id, player):
+    entityStore.submit(
+        entityStore.upsertPlayerDetail, player_id, player.user, player.name, player.flag, player.team_id, player.team_name
+    )
+
+registerDetailParser("teams", TeamSnapshot.fromPayload)
+registerDetailParser("players", PlayerSnapshot.fromPayload)
+addDetailListener("teams", recordTeam)
+addDetailListener("players", recordPlayer)
@@ -1,28 +1,85 @@
 import discord
-import aiohttp
 import os
 
-from discord.ui import Button, View
+from discord.ui import Button, DynamicItem, View
 from discord import ButtonStyle, Embed, Interaction, app_commands
-from datetime import datetime
 
-from scripts.teamNameFetcher import getCachedMappingSync
+from scripts.teamNameFetcher import getTeamIndex
+from scripts.detailFetcher import addDetailListener, fetchTeamDetail, peekDetail
+from app.snapshots import TeamSnapshot
+from app.renderCache import RenderCache
+from app.deadline import fetchWithinDeadline, respond
+from app.upcoming import matchLine
+from scripts.metrics import autocompleteLatency, buttonLatency, cacheRequests
+from scripts.entityStore import entityStore, rosterPlayerId
+from scripts.prefetcher import PREFETCH_ROSTER_LIMIT, prefetcher
+from scripts.executors import AUTOCOMPLETE_OFFLOAD_MIN, runIo
+
+RESULTS_PAGE_SIZE = int(os.getenv("RESULTS_PAGE_SIZE", "15"))  # result rows per page of the results tab
+
+# Label and style of the button that switches to each tab, in display order
+TEAM_TAB_BUTTONS = {
+    "players": ("View Players 👥", ButtonStyle.primary),
+    "staff": ("View Staff 👔", ButtonStyle.primary),
+    "upcoming": ("View Matches 📅", ButtonStyle.success),
+    "results": ("View Results 📊", ButtonStyle.green),
+}
+
+class TeamTabButton(DynamicItem[Button], template=r"vct:team:(?P<team_id>\d+):(?P<tab>players|staff|upcoming|results)"):
+    # Stateless tab button: everything needed to handle a click lives in the custom_id, so it works on any
+    # message, including ones sent before a restart, without the bot keeping the view around
+    def __init__(self, team_id: int, tab: str):
+        label, style = TEAM_TAB_BUTTONS[tab]
+        super().__init__(Button(label=label, style=style, custom_id=f"vct:team:{team_id}:{tab}"))
+        self.team_id = team_id
+        self.tab = tab
+
+    @classmethod
+    async def from_custom_id(cls, interaction: Interaction, item: Button, match):
+        return cls(int(match["team_id"]), match["tab"])
+
+    async def callback(self, interaction: Interaction):
+        with buttonLatency.time(button=f"team_{self.tab}"):
+            await showTeamTab(interaction, self.team_id, self.tab)
+
+class ResultsPageButton(DynamicItem[Button], template=r"vct:team:(?P<team_id>\d+):results:(?P<page>\d+)"):
+    # Older / newer buttons on the results tab; like the tab buttons, the page to show is in the custom_id
+    def __init__(self, team_id: int, page: int, label: str = "Results", disabled: bool = False):
+        super().__init__(Button(
+            label=label, style=ButtonStyle.secondary, custom_id=f"vct:team:{team_id}:results:{page}", disabled=disabled, row=1
+        ))
+        self.team_id = team_id
+        self.page = page
+
+    @classmethod
+    async def from_custom_id(cls, interaction: Interaction, item: Button, match):
+        return cls(int(match["team_id"]), int(match["page"]))
+
+    async def callback(self, interaction: Interaction):
+        with buttonLatency.time(button="team_results_page"):
+            await showTeamTab(interaction, self.team_id, "results", self.page)
 
-API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:5000")
+def resultPageCount(team: TeamSnapshot):
+    return max(1, -(-len(team.results) // RESULTS_PAGE_SIZE))
 
 class BaseTeamView(View):
-    def __init__(self, team_data, team_id):
+    tab = None
+
+    def __init__(self, team: TeamSnapshot, page: int = 0):
         super().__init__(timeout=None) 
-        self.team_data = team_data
-        self.team_id = team_id
-        self.team_logo = team_data["data"]["info"].get("logo", None)
-        self.team_name = team_data["data"]["info"]["name"]
-        self.players_data = team_data["data"].get("players", [])
-        self.staff_data = team_data["data"].get("staff", [])
-        self.upcoming_matches = team_data["data"].get("upcoming", [])
-        self.results = team_data["data"].get("results", [])
-
-        vlr_url = f"https://www.vlr.gg/team/{team_id}"
+        # Only used to render the embed; every interactive item is a dynamic button, so discord.py doesn't
+        # keep this view (or the snapshot) alive after the message is sent
+        self.team = team
+        self.team_id = team.team_id
+        self.team_logo = team.logo
+        self.team_name = team.name
+        self.page = page
+
+        for tab in TEAM_TAB_BUTTONS:
+            if tab != self.tab:
+                self.add_item(TeamTabButton(int(self.team_id), tab))
+
+        vlr_url = f"https://www.vlr.gg/team/{self.team_id}"
         self.add_item(Button(
             style=ButtonStyle.primary,
             label="VLR Team Page",
@@ -30,10 +87,10 @@ class BaseTeamView(View):
         ))
     
     def create_player_embed(self):
-        if self.players_data:
+        if self.team.players:
             players = "\n".join(
-                f"**[{player['user']}]({player.get('url', '#')})** ({player['name']})"
-                for player in self.players_data if "name" in player and "user" in player
+                f"**[{player.user}]({player.url})** ({player.name})"
+                for player in self.team.players
             )
         else:
             players = "No players listed"
@@ -47,10 +104,10 @@ class BaseTeamView(View):
         return embed
     
     def create_staff_embed(self):
-        if self.staff_data:
+        if self.team.staff:
             staff = "\n".join(
-                f"**[{staff['user']}]({staff.get('url', '#')})** ({staff['name']}, Role: {staff.get('tag', 'Unknown')})"
-                for staff in self.staff_data if "name" in staff and "user" in staff
+                f"**[{staff.user}]({staff.url})** ({staff.name}, Role: {staff.tag})"
+                for staff in self.team.staff
             )
         else:
             staff = "No staff listed"
@@ -66,25 +123,11 @@ class BaseTeamView(View):
     def create_upcoming_embed(self):
         embed = Embed(title=f"{self.team_name} - Upcoming Matches", color=discord.Color.green())
 
-        if self.upcoming_matches and len(self.upcoming_matches) > 0:
+        if self.team.upcoming:
             list_of_matches = []
 
-            for match in self.upcoming_matches:
-                match_url = match["match"]["url"]
-                event_name = match["event"]["name"]
-                team1_name = match["teams"][0]["tag"]
-                team2_name = match["teams"][1]["tag"]
-
-                try:
-                    match_time = datetime.strptime(match["utc"], "%a, %d %b %Y %H:%M:%S %Z")
-                    date_str = match_time.strftime("%b %d")
-                    time_str = match_time.strftime("%H:%M UTC")
-                except ValueError:
-                    date_str = "TBD"
-                    time_str = "TBD"
-
-                match_line = f"**{date_str}** · {time_str} · [{team1_name} vs {team2_name}]({match_url}) | {event_name}"
-                list_of_matches.append(match_line)
+            for match in self.team.upcoming:
+                list_of_matches.append(matchLine(match))
             
             matches_text = "\n".join(list_of_matches)
             embed.description = matches_text
@@ -102,35 +145,17 @@ class BaseTeamView(View):
     def create_results_embed(self):
         embed = Embed(title=f"{self.team_name} - Recent Results", color=discord.Color.brand_green())
 
-        if self.results and len(self.results) > 0:
-            list_of_matches = []
-
-            for _, match in enumerate(self.results[:15]):
-
-                event_name = (match["event"]["name"] or "N/A")[:22].ljust(22)
-
-                team1 = match["teams"][0]
-                team2 = match["teams"][1]
-
-                tag1 = (team1.get("tag") or "N/A")[:5].ljust(5)
-                tag2 = (team2.get("tag") or "N/A")[:5].ljust(5)
-                score = f"{team1.get('points') or 0}-{team2.get('points') or 0}".center(5)
-
-                match_text = f"{score} · {tag1.strip()} vs {tag2.strip()}"
-                match_line = f"{match_text.ljust(20)}| {event_name}"
-
-                list_of_matches.append(match_line)
-
-            matches_text = "\n".join(list_of_matches)
-            matches_text += "..."
-            matches_text = f"```{matches_text}```\nView full results on the team's VLR page"
+        if self.team.results:
+            first = self.page * RESULTS_PAGE_SIZE
+            matches_text = "\n".join(self.team.results[first:first + RESULTS_PAGE_SIZE])
+            matches_text = f"```{matches_text}```"
 
             embed.description = matches_text
 
             if self.team_logo:
                 embed.set_thumbnail(url=self.team_logo)
 
-            embed.set_footer(text=f"Team ID: {self.team_id}")
+            embed.set_footer(text=f"Page {self.page + 1}/{resultPageCount(self.team)} · Team ID: {self.team_id}")
         else:
             embed.description = "No recent results"
             if self.team_logo:
@@ -138,112 +163,121 @@ class BaseTeamView(View):
         return embed
 
 class TeamInfoView(BaseTeamView):
-    @discord.ui.button(label="View Staff 👔", style=ButtonStyle.primary, custom_id="view_staff_from_players")
-    async def view_staff_button(self, interaction: Interaction, button: Button):
-        staff_view = StaffView(self.team_data, self.team_id)
-        staff_embed = self.create_staff_embed()
-        await interaction.response.edit_message(embed=staff_embed, view=staff_view)
-
-    @discord.ui.button(label="View Matches 📅", style=ButtonStyle.success, custom_id="view_matches_from_players")
-    async def view_matches_button(self, interaction: Interaction, button: Button):
-        matches_view = UpcomingMatchesView(self.team_data, self.team_id)
-        matches_embed = self.create_upcoming_embed()
-        await interaction.response.edit_message(embed=matches_embed, view=matches_view)
-    
-    @discord.ui.button(label="View Results 📊", style=ButtonStyle.green, custom_id="view_results_from_matches")
-    async def view_results_button(self, interaction: Interaction, button: Button):
-        results_view = ResultsView(self.team_data, self.team_id)
-        results_embed = self.create_results_embed()
-        await interaction.response.edit_message(embed=results_embed, view=results_view)
+    tab = "players"
+
+    def create_embed(self):
+        return self.create_player_embed()
 
 class StaffView(BaseTeamView):
-    @discord.ui.button(label="View Players 👥", style=ButtonStyle.primary, custom_id="view_players_from_staff")
-    async def view_players_button(self, interaction: Interaction, button: Button):
-        player_view = TeamInfoView(self.team_data, self.team_id)
-        player_embed = self.create_player_embed()
-        await interaction.response.edit_message(embed=player_embed, view=player_view)
-    
-    @discord.ui.button(label="View Matches 📅", style=ButtonStyle.success, custom_id="view_matches_from_staff")
-    async def view_matches_button(self, interaction: Interaction, button: Button):
-        matches_view = UpcomingMatchesView(self.team_data, self.team_id)
-        matches_embed = self.create_upcoming_embed()
-        await interaction.response.edit_message(embed=matches_embed, view=matches_view)
-    
-    @discord.ui.button(label="View Results 📊", style=ButtonStyle.green, custom_id="view_results_from_staff")
-    async def view_results_button(self, interaction: Interaction, button: Button):
-        results_view = ResultsView(self.team_data, self.team_id)
-        results_embed = self.create_results_embed()
-        await interaction.response.edit_message(embed=results_embed, view=results_view)
+    tab = "staff"
+
+    def create_embed(self):
+        return self.create_staff_embed()
 
 class UpcomingMatchesView(BaseTeamView):
-    @discord.ui.button(label="View Players 👥", style=ButtonStyle.primary, custom_id="view_players_from_upcoming")
-    async def view_players_button(self, interaction: Interaction, button: Button):
-        player_view = TeamInfoView(self.team_data, self.team_id)
-        player_embed = self.create_player_embed()
-        await interaction.response.edit_message(embed=player_embed, view=player_view)
-    
-    # Add button to view staff
-    @discord.ui.button(label="View Staff 👔", style=ButtonStyle.primary, custom_id="view_staff_from_upcoming")
-    async def view_staff_button(self, interaction: Interaction, button: Button):
-        staff_view = StaffView(self.team_data, self.team_id)
-        staff_embed = self.create_staff_embed()
-        await interaction.response.edit_message(embed=staff_embed, view=staff_view)
-    
-    @discord.ui.button(label="View Results 📊", style=ButtonStyle.green, custom_id="view_results_from_upcoming")
-    async def view_results_button(self, interaction: Interaction, button: Button):
-        results_view = ResultsView(self.team_data, self.team_id)
-        results_embed = self.create_results_embed()
-        await interaction.response.edit_message(embed=results_embed, view=results_view)
+    tab = "upcoming"
+
+    def create_embed(self):
+        return self.create_upcoming_embed()
 
 class ResultsView(BaseTeamView):
-    @discord.ui.button(label="View Players 👥", style=ButtonStyle.primary, custom_id="view_players_from_results")
-    async def view_players_button(self, interaction: Interaction, button: Button):
-        player_view = TeamInfoView(self.team_data, self.team_id)
-        player_embed = self.create_player_embed()
-        await interaction.response.edit_message(embed=player_embed, view=player_view)
-    
-    # Add button to view staff
-    @discord.ui.button(label="View Staff 👔", style=ButtonStyle.primary, custom_id="view_staff_from_results")
-    async def view_staff_button(self, interaction: Interaction, button: Button):
-        staff_view = StaffView(self.team_data, self.team_id)
-        staff_embed = self.create_staff_embed()
-        await interaction.response.edit_message(embed=staff_embed, view=staff_view)
-
-    @discord.ui.button(label="View Matches 📅", style=ButtonStyle.success, custom_id="view_matches_from_results")
-    async def view_matches_button(self, interaction: Interaction, button: Button):
-        matches_view = UpcomingMatchesView(self.team_data, self.team_id)
-        matches_embed = self.create_upcoming_embed()
-        await interaction.response.edit_message(embed=matches_embed, view=matches_view)
+    tab = "results"
+
+    def __init__(self, team: TeamSnapshot, page: int = 0):
+        super().__init__(team, page)
+        pages = resultPageCount(team)
+        if pages > 1:
+            # Custom IDs must differ within a view, so the disabled button at either end points at a real page
+            self.add_item(ResultsPageButton(int(self.team_id), max(page - 1, 0), "◀ Newer", disabled=page == 0))
+            self.add_item(ResultsPageButton(int(self.team_id), min(page + 1, pages - 1), "Older ▶", disabled=page >= pages - 1))
+
+    def create_embed(self):
+        return self.create_results_embed()
+
+TEAM_TAB_VIEWS = {
+    "players": TeamInfoView,
+    "staff": StaffView,
+    "upcoming": UpcomingMatchesView,
+    "results": ResultsView,
+}
+
+# (team_id, tab, page) -> (embed, view) for the snapshot version they were rendered from. The views are fully
+# dynamic (no per-message state), so one instance can be sent any number of times. Results pages are rendered
+# when someone opens them; every other tab only has page 0.
+teamRenderCache = RenderCache()
+
+def renderTeamTab(team: TeamSnapshot, tab: str, page: int = 0):
+    # A refreshed payload may have fewer pages than the message the click came from
+    page = min(page, resultPageCount(team) - 1) if tab == "results" else 0
+    key = (int(team.team_id), tab, page)
+    rendered = teamRenderCache.get(key, team.version)
+    cacheRequests.inc(cache="team_render", result="miss" if rendered is None else "hit")
+    if rendered is None:
+        view = TEAM_TAB_VIEWS[tab](team, page)
+        rendered = (view.create_embed(), view)
+        teamRenderCache.set(key, team.version, rendered)
+    return rendered
+
+def invalidateTeamRenders(team_id, team):
+    # A refreshed payload means every cached tab for that team is outdated
+    for tab in TEAM_TAB_VIEWS:
+        teamRenderCache.invalidate((int(team_id), tab, 0))
+    for page in range(1, resultPageCount(team)):
+        teamRenderCache.invalidate((int(team_id), "results", page))
+
+addDetailListener("teams", invalidateTeamRenders)
+
+async def showTeamTab(interaction: Interaction, team_id: int, tab: str, page: int = 0):
+    # Button clicks carry only the team ID and tab; the team itself comes from the detail cache
+    status, team = await fetchWithinDeadline(
+        interaction, fetchTeamDetail(team_id), fallback=lambda: peekDetail("teams", team_id), edit=True, label=f"team {team_id} {tab}"
+    )
+    if status != 200:
+        await respond(interaction, content=f"❌ Error: Unable to fetch data for team ID {team_id} (status code {status})", ephemeral=True)
+        return
+
+    embed, view = renderTeamTab(team, tab, page)
+    await respond(interaction, edit=True, embed=embed, view=view)
 
 async def teamInfoById(interaction: Interaction, team_id: int):
-    url = f"{API_BASE_URL}/api/v1/teams/{team_id}"
-    
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            if response.status == 200:
-                # Get team data
-                team_data = await response.json()
-                
-                # Create the view and embed
-                view = TeamInfoView(team_data, team_id)
-                embed = view.create_player_embed()
-                
-                # Send the initial message
-                await interaction.response.send_message(embed=embed, view=view)
-            else:
-                await interaction.response.send_message(f"❌ Error: Unable to fetch data for team ID {team_id} (status code {response.status})")
+    status, team = await fetchWithinDeadline(
+        interaction, fetchTeamDetail(team_id), fallback=lambda: peekDetail("teams", team_id), label=f"team {team_id}"
+    )
+
+    if status == 200:
+        # Create the view and embed
+        embed, view = renderTeamTab(team, "players")
+        
+        # Send the initial message
+        await respond(interaction, embed=embed, view=view)
+
+        # People often open roster players next
+        for member in team.players[:PREFETCH_ROSTER_LIMIT]:
+            prefetcher.schedule("players", rosterPlayerId(member.url))
+    else:
+        await respond(interaction, content=f"❌ Error: Unable to fetch data for team ID {team_id} (status code {status})")
+
+def addStoreTeams(matches, teams):
+    # Fill the remaining slots from entity store matches, skipping teams the index already returned
+    seen = {str(team["id"]) for team in matches}
+    for team in teams:
+        if team["id"] not in seen and len(matches) < 25:
+            matches.append(team)
+            seen.add(team["id"])
+    return matches
 
 async def teamNameAutocomplete(interaction: Interaction, current: str) -> list[app_commands.Choice[str]]:
 
-    _, teamList = getCachedMappingSync()
+    index = getTeamIndex()
+    with autocompleteLatency.time(kind="team"):
+        if len(index) >= AUTOCOMPLETE_OFFLOAD_MIN:
+            matches = await runIo(index.search, current, 25)
+        else:
+            matches = index.search(current, 25)
 
-    if not current:
-        matches = teamList[:25]
-    else:
-        currentLower = current.lower()
-        matches = [
-            team for team in teamList if currentLower in team["name"].lower()
-        ][:25]
+        # The entity store also covers the time before the name cache has loaded; it's a SQLite read, so on a thread
+        if current and len(matches) < 25:
+            addStoreTeams(matches, await runIo(entityStore.searchTeams, current, 25))
     
     return [
         app_commands.Choice(name=team["name"], value=team["id"])
@@ -0,0 +1,110 @@
+# /upcoming: matches across every team, answered from the in-memory schedule index.
+# The index is seeded from the team payloads in the shared store on startup and kept current by every team detail
+# fetched after that, so the command never goes upstream; it only knows about teams someone has looked at.
+
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+import discord
+from discord import Embed, Interaction, app_commands
+
+from app.snapshots import parseUpcoming
+from app.deadline import respond
+from scripts.detailFetcher import addDetailListener
+from scripts.entityStore import canonicalRegion, entityStore
+from scripts.executors import runIo
+from scripts.scheduleIndex import ScheduleIndex
+from scripts.sharedStore import sharedStore
+from scripts.teamNameFetcher import REGIONS
+
+UPCOMING_LIMIT = int(os.getenv("UPCOMING_LIMIT", "20"))  # matches per /upcoming reply
+
+# Aliases of the same region (e.g. "oce" / "oceania") are offered once, under the name the entity store keeps
+REGION_CHOICES = [
+    app_commands.Choice(name=region.upper(), value=region) for region in dict.fromkeys(map(canonicalRegion, REGIONS))
+]
+
+schedule = ScheduleIndex()
+
+# team ID -> region, so the detail listener (which runs on the loop) doesn't query the entity store each time.
+# Teams the store has no region for yet aren't cached and are looked up again with their next payload.
+_regions = {}
+_regionLookups = {}  # team ID -> lookup task in flight
+
+def matchLine(match):
+    if match.start is None:
+        date_str = "TBD"
+        time_str = "TBD"
+    else:
+        match_time = datetime.fromtimestamp(match.start, timezone.utc)
+        date_str = match_time.strftime("%b %d")
+        time_str = match_time.strftime("%H:%M UTC")
+    return f"**{date_str}** · {time_str} · [{match.team1} vs {match.team2}]({match.url}) | {match.event}"
+
+def recordSchedule(team_id, team):
+    schedule.updateTeam(team_id, _regions.get(team_id), team.upcoming)
+    if team_id not in _regions and team_id not in _regionLookups:
+        _regionLookups[team_id] = asyncio.create_task(lookUpRegion(team_id))
+
+async def lookUpRegion(team_id):
+    try:
+        region = (await runIo(entityStore.teamRegions, [team_id])).get(team_id)
+    finally:
+        _regionLookups.pop(team_id, None)
+    if region is not None:
+        _regions[team_id] = region
+        schedule.setRegion(team_id, region)
+
+addDetailListener("teams", recordSchedule)
+
+def parseStoredTeams(rows):
+    # Runs on a thread: (id, body) rows from the shared store -> (team ID, region, upcoming matches)
+    parsed = []
+    for team_id, body in rows:
+        try:
+            parsed.append((team_id, parseUpcoming(json.loads(body))))
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            print(f"⚠️ Skipping stored team {team_id} for the schedule: {type(e).__name__}: {str(e)}")
+    regions = entityStore.teamRegions(team_id for team_id, _ in parsed)
+    return [(team_id, regions.get(team_id), matches) for team_id, matches in parsed]
+
+async def seedSchedule():
+    rows = await sharedStore.listDetails("teams")
+    if not rows:
+        return
+    for team_id, region, matches in await runIo(parseStoredTeams, rows):
+        if region is not None:
+            _regions[team_id] = region
+        schedule.updateTeam(team_id, region, matches)
+    print(f"📅 Schedule seeded with {len(schedule)} matches from {schedule.teamCount()} teams")
+
+async def upcomingMatches(interaction: Interaction, region: str = None, event: str = None, days: int = 1):
+    now = time.time()
+    schedule.prune(now)
+    matches = schedule.between(now, now + days * 86400, region=region, event=event, limit=UPCOMING_LIMIT)
+
+    title = "Upcoming Matches"
+    if region:
+        title += f" - {region.upper()}"
+    embed = Embed(title=title, color=discord.Color.green())
+
+    if matches:
+        embed.description = "\n".join(matchLine(match) for match in matches)
+    else:
+        embed.description = "No upcoming matches"
+        if event:
+            embed.description += f" for events matching \"{event}\""
+    period = "24 hours" if days == 1 else f"{days} days"
+    embed.set_footer(text=f"Next {period} · from the schedules of {schedule.teamCount()} teams")
+
+    await respond(interaction, embed=embed)
+
+async def eventAutocomplete(interaction: Interaction, current: str) -> list[app_commands.Choice[str]]:
+    current = current.lower()
+    return [
+        app_commands.Choice(name=name[:100], value=name[:100])
+        for name in schedule.events() if current in name.lower()
+    ][:25]
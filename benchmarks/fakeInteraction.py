@@ -0,0 +1,65 @@
+# Stub of the parts of discord.Interaction the handlers touch, so they can run without a gateway connection.
+# Records when the interaction was acknowledged and when the final answer went out.
+
+import time
+from datetime import timedelta
+
+import discord
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.done = False
+
+    def is_done(self):
+        return self.done
+
+    async def defer(self, thinking=False, **kwargs):
+        self.done = True
+        self.interaction.record("defer", final=False)
+
+    async def send_message(self, content=None, **kwargs):
+        self.done = True
+        self.interaction.record("send", content, **kwargs)
+
+    async def edit_message(self, content=None, **kwargs):
+        self.done = True
+        self.interaction.record("edit", content, **kwargs)
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self.interaction = interaction
+
+    async def send(self, content=None, **kwargs):
+        self.interaction.record("followup", content, **kwargs)
+
+class FakeInteraction:
+    def __init__(self, user_id=0, guild_id=0, age=0.0):
+        # age: how long the interaction already waited before reaching the handler; it counts against the deadline
+        self.created_at = discord.utils.utcnow() - timedelta(seconds=age)
+        self.started = time.perf_counter() - age
+        self.user = discord.Object(user_id)
+        self.guild_id = guild_id
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+        self.events = []
+        self.ackedAt = None
+        self.answeredAt = None
+        self.error = False
+
+    def record(self, kind, content=None, final=True, **kwargs):
+        now = time.perf_counter() - self.started
+        self.events.append(kind)
+        if self.ackedAt is None:
+            self.ackedAt = now
+        if final:
+            self.answeredAt = now
+            # Handlers answer failures with plain "❌ ..." content and no embed
+            self.error = kwargs.get("embed") is None
+
+    async def edit_original_response(self, content=None, **kwargs):
+        self.record("edit_original", content, **kwargs)
+
+    @property
+    def deferred(self):
+        return "defer" in self.events
@@ -0,0 +1,230 @@
+# Local stand-in for the VLR API, for benchmarks and load tests.
+# Serves /api/v1/teams, /api/v1/players and the team / player detail endpoints from a generated dataset of any
+# size, with injectable latency and error rates. List responses carry an ETag and honour If-None-Match.
+# Run standalone with:
+#   python -m benchmarks.fakeVlrApi --players 100000 --port 5000
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import socket
+
+from aiohttp import web
+
+REGIONS = ['na', 'eu', 'ap', 'jp', 'br', 'oce', 'gc', 'la-s', 'la-n', 'oceania', 'mena']
+
+SYLLABLES = ["ka", "ze", "ro", "ni", "va", "lo", "tr", "en", "sh", "ax", "yu", "mi", "do", "ri", "qu", "ph", "ox", "el"]
+WORDS = ["Esports", "Gaming", "Academy", "Club", "Team", "Squad", "Legion", "Union", "Five", "Storm"]
+
+def makeName(rng, parts):
+    return "".join(rng.choice(SYLLABLES) for _ in range(parts)).capitalize()
+
+class Dataset:
+    def __init__(self, teams=2000, players=20000, rosterSize=5, upcoming=3, results=40, seed=1):
+        rng = random.Random(seed)
+        self.rosterSize = rosterSize
+        self.upcoming = upcoming
+        self.results = results
+        self.seed = seed
+
+        self.teams = []
+        for i in range(teams):
+            name = f"{makeName(rng, rng.randint(2, 3))} {rng.choice(WORDS)}"
+            self.teams.append({
+                "id": str(i + 1),
+                "url": f"https://www.vlr.gg/team/{i + 1}/{name.lower().replace(' ', '-')}",
+                "name": name,
+                "logo": f"https://owcdn.net/img/{i + 1}.png",
+                "region": REGIONS[i % len(REGIONS)],
+            })
+
+        self.players = []
+        for i in range(players):
+            user = makeName(rng, rng.randint(2, 4))
+            self.players.append({
+                "id": str(i + 1),
+                "url": f"https://www.vlr.gg/player/{i + 1}/{user.lower()}",
+                "name": f"{makeName(rng, 2)} {makeName(rng, 3)}",
+                "user": user,
+                "country": rng.choice(["us", "ca", "br", "jp", "kr", "fr", "tr"]),
+                "region": REGIONS[i % len(REGIONS)],
+                "team_id": str(i % teams + 1) if teams else "",
+            })
+
+    def teamsIn(self, region):
+        return [team for team in self.teams if region is None or team["region"] == region]
+
+    def playersIn(self, region):
+        return [player for player in self.players if region is None or player["region"] == region]
+
+    def team(self, team_id):
+        if not 1 <= team_id <= len(self.teams):
+            return None
+        rng = random.Random(self.seed * 1_000_003 + team_id)
+        team = self.teams[team_id - 1]
+        roster = [self.players[(team_id - 1 + k * len(self.teams)) % len(self.players)] for k in range(self.rosterSize)] if self.players else []
+        opponents = [rng.choice(self.teams) for _ in range(self.upcoming + self.results)]
+
+        def side(other, points=None):
+            entry = {"name": other["name"], "tag": other["name"][:3].upper(), "logo": other["logo"]}
+            if points is not None:
+                entry["points"] = str(points)
+            return entry
+
+        return {
+            "info": {"name": team["name"], "tag": team["name"][:3].upper(), "logo": team["logo"]},
+            "players": [{"id": p["id"], "url": p["url"], "user": p["user"], "name": p["name"], "img": "", "country": p["country"]} for p in roster],
+            "staff": [{"id": "0", "url": "https://www.vlr.gg/player/0/coach", "user": "coach", "name": "Coach", "tag": "head coach"}],
+            "upcoming": [
+                {
+                    "match": {"id": str(team_id * 100 + k), "url": f"https://www.vlr.gg/{team_id * 100 + k}/match"},
+                    "event": {"name": f"Event {k % 7}", "logo": ""},
+                    "teams": [side(team), side(other)],
+                    "utc": f"Sun, {1 + k % 28:02d} Nov 2026 18:00:00 GMT",
+                }
+                for k, other in enumerate(opponents[:self.upcoming])
+            ],
+            "results": [
+                {
+                    "match": {"id": str(team_id * 1000 + k), "url": f"https://www.vlr.gg/{team_id * 1000 + k}/match"},
+                    "event": {"name": f"Event {k % 7}", "logo": ""},
+                    "teams": [side(team, rng.randint(0, 2)), side(other, rng.randint(0, 2))],
+                    "utc": f"Sat, {1 + k % 28:02d} Mar 2025 10:00:00 GMT",
+                }
+                for k, other in enumerate(opponents[self.upcoming:])
+            ],
+        }
+
+    def rename(self, count, rng):
+        # Simulate upstream edits: rename `count` random players
+        for player in rng.sample(self.players, min(count, len(self.players))):
+            player["user"] += "x"
+
+    def player(self, player_id):
+        if not 1 <= player_id <= len(self.players):
+            return None
+        player = self.players[player_id - 1]
+        team = self.teams[int(player["team_id"]) - 1] if player["team_id"] else None
+        return {
+            "info": {"user": player["user"], "name": player["name"], "img": "", "url": player["url"], "flag": player["country"]},
+            "team": {"id": team["id"], "url": team["url"], "name": team["name"], "logo": team["logo"], "joined": "2024"} if team else {},
+            "socials": {"twitter_url": f"https://x.com/{player['user'].lower()}", "twitch_url": ""},
+        }
+
+class FakeVlrApi:
+    # latency: base delay per request, jitter: extra uniform delay, errorRate: share of requests answered with errorStatus.
+    # All of them can be changed while the server runs.
+    def __init__(self, dataset, latency=0.0, jitter=0.0, errorRate=0.0, errorStatus=500, seed=1, etags=True):
+        self.dataset = dataset
+        self.etags = etags
+        self.latency = latency
+        self.jitter = jitter
+        self.errorRate = errorRate
+        self.errorStatus = errorStatus
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self._lists = {}
+        self._runner = None
+        self.baseUrl = None
+
+    def listBody(self, kind, region):
+        # Bulk bodies (and their ETags) are encoded once so the server isn't what's being measured
+        key = (kind, region)
+        if key not in self._lists:
+            items = self.dataset.teamsIn(region) if kind == "teams" else self.dataset.playersIn(region)
+            body = json.dumps({"status": "OK", "size": len(items), "data": items}).encode("utf-8")
+            self._lists[key] = (body, f'"{hashlib.sha1(body).hexdigest()}"')
+        return self._lists[key]
+
+    def changed(self):
+        # Call after editing the dataset so list bodies are re-encoded
+        self._lists.clear()
+
+    async def delay(self):
+        self.requests += 1
+        wait = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        if self.errorRate and self.rng.random() < self.errorRate:
+            self.errors += 1
+            return web.json_response({"status": "error"}, status=self.errorStatus)
+        return None
+
+    async def listHandler(self, request):
+        error = await self.delay()
+        if error is not None:
+            return error
+        kind = request.match_info["kind"]
+        body, etag = self.listBody(kind, request.query.get("region"))
+        if not self.etags:
+            return web.Response(body=body, content_type="application/json")
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(body=body, content_type="application/json", headers={"ETag": etag})
+
+    async def detailHandler(self, request):
+        error = await self.delay()
+        if error is not None:
+            return error
+        entity_id = int(request.match_info["id"])
+        data = self.dataset.team(entity_id) if request.match_info["kind"] == "teams" else self.dataset.player(entity_id)
+        if data is None:
+            return web.json_response({"status": "error", "message": "not found"}, status=404)
+        return web.json_response({"status": "OK", "data": data})
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get(r"/api/v1/{kind:teams|players}", self.listHandler)
+        app.router.add_get(r"/api/v1/{kind:teams|players}/{id:\d+}", self.detailHandler)
+        return app
+
+    async def start(self, host="127.0.0.1", port=0):
+        # Port 0 binds a free port; the chosen one ends up in baseUrl
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        await web.SockSite(self._runner, sock).start()
+        self.baseUrl = f"http://{host}:{sock.getsockname()[1]}"
+        return self.baseUrl
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+def addDatasetArguments(parser):
+    parser.add_argument("--teams", type=int, default=2000, help="teams in the generated dataset")
+    parser.add_argument("--players", type=int, default=20000, help="players in the generated dataset")
+    parser.add_argument("--results", type=int, default=40, help="past results per team detail")
+    parser.add_argument("--latency", type=float, default=0.0, help="base upstream latency per request, seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra uniform latency per request, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+
+def apiFromArguments(args):
+    dataset = Dataset(teams=args.teams, players=args.players, results=args.results, seed=args.seed)
+    return FakeVlrApi(dataset, args.latency, args.jitter, args.error_rate, args.error_status, args.seed)
+
+async def serve(args):
+    api = apiFromArguments(args)
+    print(f"🧪 Fake VLR API with {len(api.dataset.teams)} teams / {len(api.dataset.players)} players on {await api.start(args.host, args.port)}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await api.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a generated VLR API dataset locally")
+    addDatasetArguments(parser)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
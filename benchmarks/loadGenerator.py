@@ -0,0 +1,305 @@
+# Load generator and traffic replay for the interaction handlers.
+# Drives the real slash command callbacks from main.py, autocomplete keystroke streams and button clicks with fake
+# interactions against the fake VLR API, all on one event loop like the bot. Ramps the arrival rate step by step
+# and reports where interactions start missing Discord's 3 second deadline.
+#   python -m benchmarks.loadGenerator --rates 100 250 500 1000 2000 --step-duration 10 --output load.json
+#   python -m benchmarks.loadGenerator --rates 500 --record trace.jsonl      # save the generated traffic
+#   python -m benchmarks.loadGenerator --replay trace.jsonl --speed 2        # replay it, twice as fast
+#
+# Trace format, one JSON object per line, ordered by "t" (seconds from the start):
+#   {"t": 0.10, "kind": "command", "command": "teamid", "value": 17}
+#   {"t": 0.25, "kind": "autocomplete", "command": "playername", "query": "ten"}
+#   {"t": 0.40, "kind": "button", "custom_id": "vct:team:17:staff"}
+
+import argparse
+import asyncio
+import contextlib
+import importlib
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.fakeInteraction import FakeInteraction
+from benchmarks.fakeVlrApi import addDatasetArguments, apiFromArguments
+from benchmarks.runBenchmarks import importBot, maxRssBytes, percentile, revision, shutdownBot, summarize
+
+INTERACTION_DEADLINE = 3.0
+KEYSTROKE_DELAY = 0.15  # seconds between autocomplete requests while someone types
+MIX = {"command": 0.2, "lookup": 0.5, "button": 0.3}  # lookup = keystroke stream followed by the command
+TEAM_TABS = ("players", "staff", "upcoming", "results", "results:1")  # the last one is the second results page
+
+def currentRssBytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return maxRssBytes()
+
+class Popularity:
+    # Zipf-like pick over 1..total: a few teams and players get most of the traffic, like real usage
+    def __init__(self, total, skew=1.0):
+        self.ids = range(1, total + 1)
+        self.weights = list(itertools.accumulate(1 / (k ** skew) for k in self.ids))
+
+    def pick(self, rng):
+        return rng.choices(self.ids, cum_weights=self.weights)[0]
+
+def generateTrace(dataset, rate, duration, rng):
+    # Sessions arrive as a Poisson process; gaps scale with each session's size so events land near `rate` per second
+    teams = Popularity(len(dataset.teams))
+    players = Popularity(len(dataset.players))
+    kinds, weights = zip(*MIX.items())
+    events = []
+    t = 0.0
+    while True:
+        session = []
+        isTeam = rng.random() < 0.5
+        kind = rng.choices(kinds, weights)[0]
+
+        if kind == "command":
+            if isTeam:
+                session.append({"t": 0, "kind": "command", "command": "teamid", "value": teams.pick(rng)})
+            else:
+                session.append({"t": 0, "kind": "command", "command": "playerid", "value": players.pick(rng)})
+        elif kind == "lookup":
+            entity_id = teams.pick(rng) if isTeam else players.pick(rng)
+            entity = dataset.teams[entity_id - 1] if isTeam else dataset.players[entity_id - 1]
+            name = entity["name"] if isTeam else entity["user"]
+            command = "teamname" if isTeam else "playername"
+            typed = min(len(name), rng.randint(2, 8))
+            for k in range(1, typed + 1):
+                session.append({"t": (k - 1) * KEYSTROKE_DELAY, "kind": "autocomplete", "command": command, "query": name[:k]})
+            session.append({"t": typed * KEYSTROKE_DELAY, "kind": "command", "command": command, "value": entity_id})
+        elif isTeam:
+            session.append({"t": 0, "kind": "button", "custom_id": f"vct:team:{teams.pick(rng)}:{rng.choice(TEAM_TABS)}"})
+        else:
+            session.append({"t": 0, "kind": "button", "custom_id": f"vct:player-team:{teams.pick(rng)}"})
+
+        t += rng.expovariate(rate / len(session))
+        if t >= duration:
+            break
+        for event in session:
+            event["t"] = round(t + event["t"], 4)
+            events.append(event)
+
+    events.sort(key=lambda event: event["t"])
+    return events
+
+def readTrace(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def writeTrace(path, events):
+    with open(path, "w", encoding="utf-8") as f:
+        for event in events:
+            f.write(json.dumps(event) + "\n")
+
+class Dispatcher:
+    # Routes trace events to the bot's handlers the same way Discord would
+    def __init__(self, modules):
+        self.commands = {name: modules.main.bot.tree.get_command(name) for name in ("teamid", "teamname", "playerid", "playername")}
+        self.autocompletes = {"teamname": modules.teamInfo.teamNameAutocomplete, "playername": modules.playerInfo.playerNameAutocomplete}
+        self.buttons = (modules.teamInfo.TeamTabButton, modules.teamInfo.ResultsPageButton, modules.playerInfo.PlayerTeamButton)
+
+    async def dispatch(self, event, interaction):
+        kind = event["kind"]
+        if kind == "command":
+            await self.commands[event["command"]].callback(interaction, event["value"])
+        elif kind == "autocomplete":
+            await self.autocompletes[event["command"]](interaction, event["query"])
+            interaction.record("autocomplete", embed=True)
+        elif kind == "button":
+            for button in self.buttons:
+                # Same custom_id matching discord.py does when it routes a click to a dynamic item
+                match = button.__discord_ui_compiled_template__.fullmatch(event["custom_id"])
+                if match:
+                    item = await button.from_custom_id(interaction, None, match)
+                    await item.callback(interaction)
+                    return
+            raise ValueError(f"no button matches {event['custom_id']}")
+        else:
+            raise ValueError(f"unknown event kind {kind}")
+
+class Sampler:
+    # Memory, in-flight work and loop lag over time
+    def __init__(self, interval):
+        self.interval = interval
+        self.samples = []
+        self.inFlight = 0
+        self.completed = 0
+        self.task = None
+
+    async def run(self, started):
+        loop = asyncio.get_running_loop()
+        while True:
+            before = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append({
+                "t": round(time.perf_counter() - started, 3),
+                "rss_bytes": currentRssBytes(),
+                "in_flight": self.inFlight,
+                "completed": self.completed,
+                "loop_lag_ms": max(0.0, loop.time() - before - self.interval) * 1000,
+            })
+
+    def start(self, started):
+        self.task = asyncio.create_task(self.run(started))
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+async def replay(dispatcher, events, speed, sampler, drainTimeout):
+    records = []
+    tasks = set()
+    started = time.perf_counter()
+
+    async def one(event, due):
+        # The interaction was "created" when it was due, so falling behind the schedule counts against the deadline
+        interaction = FakeInteraction(age=max(0.0, time.perf_counter() - due))
+        failed = False
+        sampler.inFlight += 1
+        try:
+            await dispatcher.dispatch(event, interaction)
+        except Exception as e:
+            failed = True
+            print(f"⚠️ {event['kind']} failed: {type(e).__name__}: {str(e)}")
+        finally:
+            sampler.inFlight -= 1
+            sampler.completed += 1
+        records.append((event, interaction, failed))
+
+    for event in events:
+        due = started + event["t"] / speed
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        task = asyncio.create_task(one(event, due))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    if tasks:
+        await asyncio.wait(set(tasks), timeout=drainTimeout)
+    elapsed = time.perf_counter() - started
+    for task in tasks:
+        task.cancel()
+    return records, elapsed, len(tasks)
+
+def stepReport(records, elapsed, abandoned, offered):
+    byKind = {}
+    for event, interaction, failed in records:
+        byKind.setdefault(event["kind"], []).append((interaction, failed))
+
+    def missed(interaction):
+        return interaction.ackedAt is None or interaction.ackedAt > INTERACTION_DEADLINE
+
+    report = {
+        "offered": offered,
+        "completed": len(records),
+        "abandoned": abandoned,
+        "seconds": elapsed,
+        "throughput": len(records) / elapsed if elapsed else 0,
+        "deadline_missed": sum(missed(interaction) for _, interaction, _ in records) + abandoned,
+        "kinds": {},
+    }
+    report["missed_ratio"] = report["deadline_missed"] / offered if offered else 0
+    for kind, items in byKind.items():
+        summary = summarize([i.answeredAt for i, _ in items if i.answeredAt is not None])
+        summary["ack_p99_ms"] = percentile(sorted(i.ackedAt * 1000 for i, _ in items if i.ackedAt is not None), 0.99)
+        summary["deferred"] = sum(i.deferred for i, _ in items)
+        summary["errors"] = sum(i.error for i, _ in items)
+        summary["exceptions"] = sum(failed for _, failed in items)
+        summary["deadline_missed"] = sum(missed(i) for i, _ in items)
+        report["kinds"][kind] = summary
+    return report
+
+async def run(args):
+    api = apiFromArguments(args)
+    os.environ["API_BASE_URL"] = await api.start()
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as cacheDir:
+        os.environ["CACHE_DIR"] = cacheDir
+        modules = importBot()
+        # main.py registers the slash commands on import; it only connects to Discord when run as a script
+        modules.main = importlib.import_module("main")
+        dispatcher = Dispatcher(modules)
+        sampler = Sampler(args.sample_interval)
+        drainTimeout = float(os.getenv("FOLLOWUP_DEADLINE", "10")) + 5
+        steps = []
+        scheduler = {}
+
+        try:
+            await modules.teams.fetchAllTeamNames()
+            await modules.players.fetchAllPlayerNames()
+
+            started = time.perf_counter()
+            sampler.start(started)
+            if args.replay:
+                events = readTrace(args.replay)
+                records, elapsed, abandoned = await replay(dispatcher, events, args.speed, sampler, drainTimeout)
+                steps.append({"replay": args.replay, "speed": args.speed, **stepReport(records, elapsed, abandoned, len(events))})
+            else:
+                recorded = []
+                for rate in args.rates:
+                    events = generateTrace(api.dataset, rate, args.step_duration, rng)
+                    if args.record:
+                        offset = recorded[-1]["t"] + 1 if recorded else 0
+                        recorded.extend({**event, "t": round(event["t"] + offset, 4)} for event in events)
+                    records, elapsed, abandoned = await replay(dispatcher, events, 1.0, sampler, drainTimeout)
+                    step = {"rate": rate, **stepReport(records, elapsed, abandoned, len(events))}
+                    steps.append(step)
+                    print(f"📊 {rate}/s: {step['throughput']:.0f}/s handled, {step['deadline_missed']} missed deadlines")
+                    if step["missed_ratio"] > args.miss_threshold and not args.keep_going:
+                        break
+                if args.record:
+                    writeTrace(args.record, recorded)
+            scheduler = modules.scheduler.upstreamScheduler.stats()
+        finally:
+            sampler.stop()
+            await shutdownBot(modules)
+            await api.stop()
+
+    sustainable = [step["rate"] for step in steps if "rate" in step and step["missed_ratio"] <= args.miss_threshold]
+    return {
+        "benchmark": "vctbot-load",
+        "timestamp": time.time(),
+        "revision": revision(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "upstream": {"requests": api.requests, "injected_errors": api.errors, "scheduler": scheduler},
+        "max_sustainable_rate": max(sustainable) if sustainable else None,
+        "steps": steps,
+        "timeline": sampler.samples,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the bot's interaction handlers with synthetic or recorded traffic")
+    addDatasetArguments(parser)
+    parser.add_argument("--rates", type=float, nargs="+", default=[100, 250, 500, 1000, 2000], help="interactions per second, one step each")
+    parser.add_argument("--step-duration", type=float, default=10, help="seconds of traffic per step")
+    parser.add_argument("--miss-threshold", type=float, default=0.01, help="share of missed deadlines that ends the ramp")
+    parser.add_argument("--keep-going", action="store_true", help="run every step even past the threshold")
+    parser.add_argument("--replay", help="replay a JSONL trace instead of generating traffic")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed multiplier")
+    parser.add_argument("--record", help="write the generated traffic to this JSONL trace")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="seconds between timeline samples")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(sys.stderr):
+        report = asyncio.run(run(args))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+# Offline benchmarks against the fake VLR API: name cache refreshes, autocomplete and the /team and /player
+# handlers end to end with stubbed interactions. Nothing here talks to the real API or to Discord.
+#   python -m benchmarks.runBenchmarks --players 100000 --latency 0.05 --output bench.json
+# Results are written as JSON (to stdout unless --output is given); the bot's own logging goes to stderr.
+
+import argparse
+import asyncio
+import contextlib
+import importlib
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.fakeVlrApi import addDatasetArguments, apiFromArguments
+from benchmarks.fakeInteraction import FakeInteraction
+
+BENCHMARKS = ("refresh", "autocomplete", "handlers")
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def summarize(samples):
+    # Latencies in milliseconds
+    ordered = sorted(sample * 1000 for sample in samples)
+    if not ordered:
+        return {"count": 0}
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered),
+        "p50_ms": percentile(ordered, 0.50),
+        "p95_ms": percentile(ordered, 0.95),
+        "p99_ms": percentile(ordered, 0.99),
+        "max_ms": ordered[-1],
+    }
+
+def maxRssBytes():
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == "darwin" else usage * 1024
+
+def revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def benchRefresh(modules, args, api):
+    results = {}
+    rng = random.Random(args.seed)
+    for name, refresh in (("teams", modules.teams.fetchAllTeamNames), ("players", modules.players.fetchAllPlayerNames)):
+        # The first refresh downloads and indexes everything; later ones are conditional and find nothing new
+        started = time.perf_counter()
+        _, nameList = await refresh()
+        first = time.perf_counter() - started
+
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            await refresh()
+            timings.append(time.perf_counter() - started)
+
+        # One with a few upstream edits, merged into the index as a delta
+        if name == "players":
+            api.dataset.rename(args.changes, rng)
+            api.changed()
+        started = time.perf_counter()
+        await refresh()
+        changed = time.perf_counter() - started
+
+        # One more pass under tracemalloc for the allocation peak; kept apart so it doesn't skew the timings
+        tracemalloc.start()
+        await refresh()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results[name] = {
+            "records": len(nameList),
+            "seconds": {
+                "first": first,
+                "unchanged_min": min(timings, default=None),
+                "unchanged_median": statistics.median(timings) if timings else None,
+                "changed": changed,
+            },
+            "peak_alloc_bytes": peak,
+        }
+    results["max_rss_bytes"] = maxRssBytes()
+    return results
+
+def autocompleteQueries(entries, count, rng):
+    # A mix of what people type: short prefixes, whole names, fragments from the middle and typos
+    queries = []
+    for _ in range(count):
+        name = rng.choice(entries)["name"]
+        style = rng.randrange(4)
+        if style == 0:
+            queries.append(name[:rng.randint(1, 4)])
+        elif style == 1:
+            queries.append(name.lower())
+        elif style == 2 and len(name) > 4:
+            start = rng.randrange(1, len(name) - 3)
+            queries.append(name[start:start + 3])
+        else:
+            chars = list(name)
+            if len(chars) > 2:
+                i = rng.randrange(len(chars) - 1)
+                chars[i], chars[i + 1] = chars[i + 1], chars[i]
+            queries.append("".join(chars))
+    return queries
+
+async def benchAutocomplete(modules, args):
+    rng = random.Random(args.seed)
+    results = {}
+    for name, index, autocomplete in (
+        ("teams", modules.teams.getTeamIndex(), modules.teamInfo.teamNameAutocomplete),
+        ("players", modules.players.getPlayerIndex(), modules.playerInfo.playerNameAutocomplete),
+    ):
+        if not len(index):
+            results[name] = {"count": 0}
+            continue
+        queries = autocompleteQueries(index.liveEntries(), args.queries, rng)
+        await autocomplete(None, queries[0])  # warm up
+
+        timings = []
+        started = time.perf_counter()
+        for query in queries:
+            callStarted = time.perf_counter()
+            await autocomplete(None, query)
+            timings.append(time.perf_counter() - callStarted)
+        elapsed = time.perf_counter() - started
+
+        results[name] = summarize(timings)
+        results[name]["queries_per_second"] = len(queries) / elapsed
+        results[name]["index_entries"] = len(index)
+    return results
+
+async def runHandlers(handler, ids, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    interactions = []
+
+    async def one(entity_id):
+        async with semaphore:
+            interaction = FakeInteraction()
+            interactions.append(interaction)
+            await handler(interaction, entity_id)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(entity_id) for entity_id in ids))
+    elapsed = time.perf_counter() - started
+
+    summary = summarize([interaction.answeredAt for interaction in interactions if interaction.answeredAt is not None])
+    summary["ack_p99_ms"] = percentile(sorted(i.ackedAt * 1000 for i in interactions if i.ackedAt is not None), 0.99)
+    summary["deferred"] = sum(interaction.deferred for interaction in interactions)
+    summary["errors"] = sum(interaction.error for interaction in interactions)
+    summary["requests_per_second"] = len(ids) / elapsed
+    return summary
+
+async def benchHandlers(modules, args, api):
+    rng = random.Random(args.seed)
+    results = {}
+    for name, handler, total in (
+        ("team_info", modules.teamInfo.teamInfoById, len(api.dataset.teams)),
+        ("player_info", modules.playerInfo.playerInfoById, len(api.dataset.players)),
+    ):
+        ids = rng.sample(range(1, total + 1), min(args.lookups, total))
+        before = api.requests
+        # Cold: every ID misses the detail cache. Warm: the same IDs again, served from it.
+        results[name] = {
+            "cold": await runHandlers(handler, ids, args.concurrency),
+            "warm": await runHandlers(handler, ids, args.concurrency),
+            "upstream_requests": api.requests - before,
+        }
+    return results
+
+def importBot():
+    # The bot's modules read API_BASE_URL / CACHE_DIR when they are imported, so this runs after both are set
+    names = {
+        "teams": "scripts.teamNameFetcher",
+        "players": "scripts.playerNameFetcher",
+        "teamInfo": "app.teamInfo",
+        "playerInfo": "app.playerInfo",
+        "httpClient": "scripts.httpClient",
+        "scheduler": "scripts.upstreamScheduler",
+        "executors": "scripts.executors",
+        "prefetcher": "scripts.prefetcher",
+        "sharedStore": "scripts.sharedStore",
+        "entityStore": "scripts.entityStore",
+    }
+    return argparse.Namespace(**{key: importlib.import_module(module) for key, module in names.items()})
+
+async def shutdownBot(modules):
+    # Same order as VCTBot.close(): stop the background workers first so nothing reopens the session afterwards
+    modules.prefetcher.prefetcher.stop()
+    modules.scheduler.upstreamScheduler.stop()
+    await modules.httpClient.closeSession()
+    modules.sharedStore.sharedStore.close()
+    modules.entityStore.entityStore.close()
+    modules.executors.shutdownExecutors()
+
+async def run(args):
+    api = apiFromArguments(args)
+    os.environ["API_BASE_URL"] = await api.start()
+    # Back-to-back refreshes would mostly measure the upstream rate limits; set these explicitly to include them
+    for limit in ("UPSTREAM_RATE", "UPSTREAM_DETAIL_RATE", "UPSTREAM_BULK_RATE"):
+        os.environ.setdefault(limit, "0")
+
+    with tempfile.TemporaryDirectory() as cacheDir:
+        os.environ["CACHE_DIR"] = cacheDir
+        modules = importBot()
+        results = {}
+        scheduler = {}
+        try:
+            if "refresh" in args.only:
+                results["refresh"] = await benchRefresh(modules, args, api)
+            elif "autocomplete" in args.only:
+                # Autocomplete still needs populated indexes
+                await modules.teams.fetchAllTeamNames()
+                await modules.players.fetchAllPlayerNames()
+            if "autocomplete" in args.only:
+                results["autocomplete"] = await benchAutocomplete(modules, args)
+            if "handlers" in args.only:
+                results["handlers"] = await benchHandlers(modules, args, api)
+            scheduler = modules.scheduler.upstreamScheduler.stats()
+        finally:
+            await shutdownBot(modules)
+            await api.stop()
+
+    return {
+        "benchmark": "vctbot",
+        "timestamp": time.time(),
+        "revision": revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "upstream": {"requests": api.requests, "injected_errors": api.errors, "scheduler": scheduler},
+        "results": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the VCTBot benchmarks against a local fake VLR API")
+    addDatasetArguments(parser)
+    parser.add_argument("--repeat", type=int, default=3, help="timed unchanged runs of each name cache refresh")
+    parser.add_argument("--changes", type=int, default=100, help="players renamed upstream before the changed refresh")
+    parser.add_argument("--queries", type=int, default=5000, help="autocomplete queries per index")
+    parser.add_argument("--lookups", type=int, default=200, help="distinct IDs looked up per handler")
+    parser.add_argument("--concurrency", type=int, default=20, help="handler invocations in flight at once")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(sys.stderr):
+        report = asyncio.run(run(args))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,140 @@
+# First, so the startup timer's import phase covers everything below
+from scripts.startup import startupTimer, syncCommands
+
+import asyncio
 import discord
 import os
+import time
 from dotenv import load_dotenv
 
-from app.teamInfo import teamInfoById, teamNameAutocomplete
+from app.teamInfo import ResultsPageButton, TeamTabButton, teamInfoById, teamNameAutocomplete
 from scripts.teamNameFetcher import initializeCache
 
-from app.playerInfo import playerInfoById, playerNameAutocomplete
+from app.playerInfo import PlayerTeamButton, playerInfoById, playerNameAutocomplete
 from scripts.playerNameFetcher import initializePlayerCache
 
+from app.upcoming import REGION_CHOICES, eventAutocomplete, seedSchedule, upcomingMatches
+
+from scripts.httpClient import closeSession
+from scripts.refreshScheduler import startRefreshScheduler, stopRefreshScheduler
+from scripts.metrics import commandLatency, startMetrics, stopMetrics
+from scripts.sharedStore import sharedStore
+from scripts.entityStore import entityStore
+from scripts.prefetcher import prefetcher
+from scripts.upstreamScheduler import upstreamScheduler
+from scripts.loopWatchdog import loopWatchdog
+from scripts.executors import shutdownExecutors
+
 from discord.ext import commands
 from discord import app_commands
 
 load_dotenv()
 DISCORD_BOT_TOKEN = os.getenv("DISCORD_BOT_TOKEN")
 
+# Unset: one process runs every shard Discord recommends. The shard supervisor sets both to split shards across processes.
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0")) or None
+SHARD_IDS = [int(shard) for shard in os.getenv("SHARD_IDS", "").split(",") if shard.strip()] or None
+
+class VCTBot(commands.AutoShardedBot):
+    syncTask = None
+    cacheTask = None
+
+    async def setup_hook(self):
+        # Runs after login, once per process (not on every reconnect like on_ready)
+        startupTimer.mark("login")
+
+        # Route clicks on team / player buttons from any message, including ones sent before a restart
+        self.add_dynamic_items(TeamTabButton, ResultsPageButton, PlayerTeamButton)
+
+        # Commands are global, so only the process running shard 0 syncs them. The sync doesn't hold up the
+        # gateway connection, and it is skipped when the command tree hasn't changed since the last one.
+        if SHARD_IDS is None or 0 in SHARD_IDS:
+            self.syncTask = asyncio.create_task(syncCommands(self))
+
+        await startMetrics()
+        loopWatchdog.start()
+        # Loading the caches doesn't hold up the gateway connection either; autocomplete is empty until it's done
+        self.cacheTask = asyncio.create_task(self.loadCaches())
+
+    async def loadCaches(self):
+        # Serve whatever caches are on disk and leave refreshing to the background scheduler
+        started = time.perf_counter()
+        await initializeCache()
+        await initializePlayerCache()
+        await seedSchedule()
+        startRefreshScheduler()
+        # Runs alongside the connect phase, so it is timed on its own
+        startupTimer.record("cache_load", time.perf_counter() - started)
+
+    async def close(self):
+        # Stop background refreshes and release the shared HTTP connection pool on shutdown
+        for task in (self.syncTask, self.cacheTask):
+            if task is not None:
+                task.cancel()
+        stopRefreshScheduler()
+        prefetcher.stop()
+        upstreamScheduler.stop()
+        await stopMetrics()
+        loopWatchdog.stop()
+        await closeSession()
+        sharedStore.close()
+        entityStore.close()
+        shutdownExecutors()
+        await super().close()
+
 # Bot setup with slash commands
 intents = discord.Intents.default()
-bot = commands.Bot(command_prefix="!", intents=intents)
+bot = VCTBot(command_prefix="!", intents=intents, shard_count=SHARD_COUNT, shard_ids=SHARD_IDS)
 
 # Grab the team ID and call the teamInfoById function
 @bot.tree.command(name="teamid", description="Get team info by ID")
 async def team(interaction: discord.Interaction, team_id: int):
-    await teamInfoById(interaction, team_id)
+    with commandLatency.time(command="teamid"):
+        await teamInfoById(interaction, team_id)
 
 # Grab the team name from the autocomplete, find the corresponding ID, and call the teamInfoById function
 @bot.tree.command(name="teamname", description="Get team info by Name")
 @app_commands.autocomplete(team_name=teamNameAutocomplete)
 async def team(interaction: discord.Interaction, team_name: int):
-    await teamInfoById(interaction, team_name)
+    with commandLatency.time(command="teamname"):
+        await teamInfoById(interaction, team_name)
 
 # Grab the player ID and call the playerInfoById function
 @bot.tree.command(name="playerid", description="Get player info by ID")
 async def player(interaction: discord.Interaction, player_id: int):
-    await playerInfoById(interaction, player_id)
+    with commandLatency.time(command="playerid"):
+        await playerInfoById(interaction, player_id)
 
 @bot.tree.command(name="playername", description="Get player info by Name")
 @app_commands.autocomplete(player_name=playerNameAutocomplete)
 async def player_by_name(interaction: discord.Interaction, player_name: int):
-    await playerInfoById(interaction, player_name)
+    with commandLatency.time(command="playername"):
+        await playerInfoById(interaction, player_name)
+
+# Matches across every known team in the next few days, from the schedule index (no upstream calls)
+@bot.tree.command(name="upcoming", description="Upcoming matches across teams")
+@app_commands.describe(region="Only teams from this region", event="Only matches of this event", days="How many days ahead to look")
+@app_commands.choices(region=REGION_CHOICES)
+@app_commands.autocomplete(event=eventAutocomplete)
+async def upcoming(interaction: discord.Interaction, region: str = None, event: str = None, days: app_commands.Range[int, 1, 14] = 1):
+    with commandLatency.time(command="upcoming"):
+        await upcomingMatches(interaction, region, event, days)
 
 @bot.event
 async def on_ready():
-    try:
-        synced = await bot.tree.sync()  # Force sync commands
-        print(f"Synced {len(synced)} command(s)")
-    except Exception as e:
-        print(f"Error syncing commands: {e}")
-
+    # Also fires after a reconnect that couldn't resume; only the first one is a startup phase
+    if "connect" not in startupTimer.phases:
+        startupTimer.mark("connect")
     print(f"Logged in as {bot.user}")
 
-    await initializeCache()
-    await initializePlayerCache()  # Initialize the cache when the bot is ready
+@bot.event
+async def on_disconnect():
+    startupTimer.disconnected()
+
+@bot.event
+async def on_app_command_completion(interaction: discord.Interaction, command):
+    startupTimer.served()
 
-bot.run(DISCORD_BOT_TOKEN)
+if __name__ == "__main__":
+    startupTimer.mark("import")
+    bot.run(DISCORD_BOT_TOKEN)
@@ -0,0 +1,159 @@
+# Compact on-disk format for the team / player name caches.
+#
+# Layout (little-endian):
+#   header   magic "VCTN", version u16, flags u16, timestamp f64, count u32, blob size u32
+#   ids      count x i64
+#   offsets  (count + 1) x u32 byte offsets into the blob
+#   blob     utf-8 names back to back
+#   trailer  crc32 u32 of everything above
+#
+# Files are written to a temp file and renamed into place, so readers only ever see a complete cache.
+# The old JSON caches are still read as a fallback and migrated on first load.
+
+import json
+import os
+import struct
+import sys
+import tempfile
+import zlib
+from array import array
+
+MAGIC = b"VCTN"
+VERSION = 1
+HEADER = struct.Struct("<4sHHdII")
+TRAILER = struct.Struct("<I")
+
+FLAG_STRING_IDS = 1  # ids were numeric strings upstream, hand them back as strings
+
+class CacheFormatError(Exception):
+    pass
+
+def atomicWrite(path, data):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmpPath = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmpPath, path)
+    except BaseException:
+        if os.path.exists(tmpPath):
+            os.remove(tmpPath)
+        raise
+
+def encodeNameCache(timestamp, nameList):
+    flags = 0
+    if nameList and all(isinstance(entry["id"], str) for entry in nameList):
+        flags |= FLAG_STRING_IDS
+    try:
+        ids = array("q", (int(entry["id"]) for entry in nameList))
+    except (TypeError, ValueError, OverflowError) as e:
+        raise CacheFormatError(f"non-numeric id in name cache: {str(e)}")
+
+    offsets = array("I", [0])
+    encoded = []
+    size = 0
+    for entry in nameList:
+        name = entry["name"].encode("utf-8")
+        encoded.append(name)
+        size += len(name)
+        offsets.append(size)
+
+    if sys.byteorder != "little":
+        ids.byteswap()
+        offsets.byteswap()
+
+    body = b"".join([
+        HEADER.pack(MAGIC, VERSION, flags, timestamp, len(nameList), size),
+        ids.tobytes(),
+        offsets.tobytes(),
+        *encoded,
+    ])
+    return body + TRAILER.pack(zlib.crc32(body))
+
+def decodeNameCache(data):
+    if len(data) < HEADER.size + TRAILER.size:
+        raise CacheFormatError("truncated header")
+
+    magic, version, flags, timestamp, count, size = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise CacheFormatError("bad magic")
+    if version != VERSION:
+        raise CacheFormatError(f"unsupported version {version}")
+
+    idsStart = HEADER.size
+    offsetsStart = idsStart + count * 8
+    blobStart = offsetsStart + (count + 1) * 4
+    end = blobStart + size
+    if len(data) != end + TRAILER.size:
+        raise CacheFormatError("size mismatch")
+    (crc,) = TRAILER.unpack_from(data, end)
+    if zlib.crc32(memoryview(data)[:end]) != crc:
+        raise CacheFormatError("checksum mismatch")
+
+    ids = array("q")
+    ids.frombytes(data[idsStart:offsetsStart])
+    offsets = array("I")
+    offsets.frombytes(data[offsetsStart:blobStart])
+    if sys.byteorder != "little":
+        ids.byteswap()
+        offsets.byteswap()
+
+    blob = data[blobStart:end]
+    castId = str if flags & FLAG_STRING_IDS else int
+    nameList = [
+        {"name": blob[offsets[i]:offsets[i + 1]].decode("utf-8"), "id": castId(ids[i])}
+        for i in range(count)
+    ]
+    return timestamp, nameList
+
+def writeNameCache(path, timestamp, nameList):
+    atomicWrite(path, encodeNameCache(timestamp, nameList))
+
+def readNameCache(path):
+    with open(path, "rb") as f:
+        return decodeNameCache(f.read())
+
+def readLegacyJsonCache(path, listKey):
+    with open(path, "r") as f:
+        cache = json.load(f)
+    return cache.get("timestamp", 0), cache.get(listKey, [])
+
+def loadNameCache(path, legacyPath, listKey):
+    # Returns (timestamp, nameList), or None when neither format is readable
+    if os.path.exists(path):
+        try:
+            return readNameCache(path)
+        except (OSError, CacheFormatError) as e:
+            print(f"⚠️ Error reading {os.path.basename(path)}: {str(e)}")
+
+    if legacyPath and os.path.exists(legacyPath):
+        try:
+            timestamp, nameList = readLegacyJsonCache(legacyPath, listKey)
+        except Exception as e:
+            print(f"⚠️ Error reading {os.path.basename(legacyPath)}: {str(e)}")
+            return None
+        try:
+            writeNameCache(path, timestamp, nameList)
+            print(f"🔄 Migrated {os.path.basename(legacyPath)} to {os.path.basename(path)}")
+        except (OSError, CacheFormatError) as e:
+            print(f"⚠️ Could not migrate {os.path.basename(legacyPath)}: {str(e)}")
+        return timestamp, nameList
+
+    return None
+
+def saveNameCache(path, legacyPath, listKey, timestamp, nameList):
+    try:
+        writeNameCache(path, timestamp, nameList)
+        return
+    except CacheFormatError as e:
+        print(f"⚠️ Falling back to JSON for {os.path.basename(path)}: {str(e)}")
+
+    # Ids the binary format can't hold: keep the JSON cache current and drop the outdated binary one
+    atomicWrite(legacyPath, json.dumps({"timestamp": timestamp, listKey: nameList}).encode("utf-8"))
+    if os.path.exists(path):
+        os.remove(path)
+
+def buildNameMappings(nameList):
+    return {entry["name"].lower(): entry["id"] for entry in nameList}
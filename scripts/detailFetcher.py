@@ -0,0 +1,128 @@
+# Cached access to the /teams/{id} and /players/{id} detail endpoints.
+# Fresh entries are served straight from memory; stale ones are served immediately and refreshed in the background.
+# Misses check the store shared with the other shard processes before going upstream.
+
+import asyncio
+import json
+import os
+import time
+
+from scripts.httpClient import API_BASE_URL, getSession
+from scripts.responseCache import ResponseCache
+from scripts.singleFlight import upstreamFlights
+from scripts.hedge import hedged
+from scripts.metrics import cacheRequests
+from scripts.sharedStore import sharedStore
+from scripts.upstreamScheduler import BACKGROUND, upstreamLane, upstreamScheduler
+
+TEAM_DETAIL_TTL = int(os.getenv("TEAM_DETAIL_TTL", "300"))  # 5 minutes
+PLAYER_DETAIL_TTL = int(os.getenv("PLAYER_DETAIL_TTL", "900"))  # 15 minutes
+DETAIL_STALE_TTL = int(os.getenv("DETAIL_STALE_TTL", "3600"))  # how long past expiry a payload may still be served
+
+DETAIL_TTLS = {
+    "teams": TEAM_DETAIL_TTL,
+    "players": PLAYER_DETAIL_TTL,
+}
+
+detailCache = ResponseCache()
+
+# Background revalidations in flight, keyed like the cache
+_revalidating = {}
+
+# kind -> parser(entity_id, payload) turning the raw JSON into whatever the cache should hold
+_parsers = {}
+
+# kind -> callbacks(entity_id, data) run whenever a fresh payload for that kind is stored
+_listeners = {}
+
+def registerDetailParser(kind, parser):
+    _parsers[kind] = parser
+
+def addDetailListener(kind, listener):
+    _listeners.setdefault(kind, []).append(listener)
+
+async def requestDetail(kind, entity_id):
+    # Concurrent lookups of the same entity (foreground or revalidation) share one GET, hedged with a
+    # second one if the first is slow
+    return await upstreamFlights.do(("detail", kind, entity_id), lambda: hedged(lambda: getDetail(kind, entity_id)))
+
+async def getDetail(kind, entity_id):
+    # Another process may have fetched this entity already
+    shared = await sharedStore.getDetail(kind, entity_id)
+    if shared is not None and shared[1] > time.time():
+        cacheRequests.inc(cache=kind, result="shared")
+        return 200, storeDetail(kind, entity_id, *shared)
+
+    url = f"{API_BASE_URL}/api/v1/{kind}/{entity_id}"
+
+    await upstreamScheduler.acquire("detail")
+    async with getSession().get(url) as response:
+        if response.status != 200:
+            if shared is not None:
+                # Upstream is failing but a stale shared copy is still within its window
+                return 200, storeDetail(kind, entity_id, *shared)
+            return response.status, None
+        body = await response.read()
+
+    ttl = DETAIL_TTLS[kind]
+    sharedStore.putDetail(kind, entity_id, body, ttl, DETAIL_STALE_TTL)
+    now = time.time()
+    return 200, storeDetail(kind, entity_id, body, now + ttl, now + ttl + DETAIL_STALE_TTL)
+
+def storeDetail(kind, entity_id, body, expiresAt, staleUntil):
+    # Parse a raw payload into the local cache, keeping the expiry it was given (wall-clock times)
+    data = json.loads(body)
+    size = len(body)
+    parser = _parsers.get(kind)
+    if parser is not None:
+        # Only the parsed form is kept; the raw payload is dropped here
+        data = parser(entity_id, data)
+        size = data.approxSize()
+    now = time.time()
+    detailCache.set((kind, entity_id), data, size, max(0, expiresAt - now), max(0, staleUntil - max(expiresAt, now)))
+    for listener in _listeners.get(kind, []):
+        listener(entity_id, data)
+    return data
+
+async def revalidate(kind, entity_id):
+    try:
+        # Whoever is waiting already has the stale copy, so this doesn't need an interactive slot
+        with upstreamLane(BACKGROUND):
+            status, _ = await requestDetail(kind, entity_id)
+        if status != 200:
+            print(f"⚠️ Revalidating {kind}/{entity_id} failed: Status {status}")
+    except Exception as e:
+        print(f"⚠️ Exception revalidating {kind}/{entity_id}: {str(e)}")
+    finally:
+        _revalidating.pop((kind, entity_id), None)
+
+def scheduleRevalidate(kind, entity_id):
+    key = (kind, entity_id)
+    if key not in _revalidating:
+        _revalidating[key] = asyncio.create_task(revalidate(kind, entity_id))
+
+async def fetchDetail(kind, entity_id):
+    # Returns (status, data); data is None unless status is 200
+    entity_id = int(entity_id)  # IDs arrive as ints from commands and as strings from payloads
+    entry = detailCache.get((kind, entity_id))
+    if entry is not None:
+        if not entry.isFresh():
+            cacheRequests.inc(cache=kind, result="stale")
+            scheduleRevalidate(kind, entity_id)
+        else:
+            cacheRequests.inc(cache=kind, result="hit")
+        return 200, entry.value
+
+    cacheRequests.inc(cache=kind, result="miss")
+    return await requestDetail(kind, entity_id)
+
+def peekDetail(kind, entity_id):
+    # Last known payload regardless of age, for when upstream can't answer in time; None if never fetched
+    entry = detailCache.peek((kind, int(entity_id)))
+    return entry.value if entry is not None else None
+
+async def fetchTeamDetail(team_id):
+    return await fetchDetail("teams", team_id)
+
+async def fetchPlayerDetail(player_id):
+    return await fetchDetail("players", player_id)
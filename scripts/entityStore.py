@@ -0,0 +1,304 @@
+# Local SQLite store of teams, players and rosters, with FTS5 name search.
+# The name refreshes upsert every team and player they see, and the detail listeners add logos, real names,
+# rosters and player -> team links. Only rows that actually changed are rewritten, so a refresh of an unchanged
+# data set is cheap. Writes go through one background thread; reads use a connection per thread (WAL keeps them
+# from blocking each other), so they can run on the event loop or on the I/O threads.
+
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+CACHE_DIR = os.getenv("CACHE_DIR", ".")
+ENTITY_STORE = os.getenv("ENTITY_STORE", "1") == "1"
+ENTITY_STORE_FILE = os.path.join(CACHE_DIR, "entities.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS teams (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    logo TEXT,
+    region TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS players (
+    id INTEGER PRIMARY KEY,
+    handle TEXT NOT NULL,
+    name TEXT,
+    country TEXT,
+    region TEXT,
+    team_id INTEGER,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS players_team ON players (team_id);
+CREATE TABLE IF NOT EXISTS rosters (
+    team_id INTEGER NOT NULL,
+    member TEXT NOT NULL,
+    player_id INTEGER,
+    handle TEXT NOT NULL,
+    role TEXT NOT NULL,
+    tag TEXT,
+    PRIMARY KEY (team_id, member)
+);
+CREATE INDEX IF NOT EXISTS rosters_player ON rosters (player_id);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS teams_fts USING fts5(name, content='teams', content_rowid='id', prefix='2 3');
+CREATE TRIGGER IF NOT EXISTS teams_ai AFTER INSERT ON teams BEGIN
+    INSERT INTO teams_fts (rowid, name) VALUES (new.id, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS teams_ad AFTER DELETE ON teams BEGIN
+    INSERT INTO teams_fts (teams_fts, rowid, name) VALUES ('delete', old.id, old.name);
+END;
+CREATE TRIGGER IF NOT EXISTS teams_au AFTER UPDATE OF name ON teams BEGIN
+    INSERT INTO teams_fts (teams_fts, rowid, name) VALUES ('delete', old.id, old.name);
+    INSERT INTO teams_fts (rowid, name) VALUES (new.id, new.name);
+END;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS players_fts USING fts5(handle, name, content='players', content_rowid='id', prefix='2 3');
+CREATE TRIGGER IF NOT EXISTS players_ai AFTER INSERT ON players BEGIN
+    INSERT INTO players_fts (rowid, handle, name) VALUES (new.id, new.handle, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS players_ad AFTER DELETE ON players BEGIN
+    INSERT INTO players_fts (players_fts, rowid, handle, name) VALUES ('delete', old.id, old.handle, old.name);
+END;
+CREATE TRIGGER IF NOT EXISTS players_au AFTER UPDATE OF handle, name ON players BEGIN
+    INSERT INTO players_fts (players_fts, rowid, handle, name) VALUES ('delete', old.id, old.handle, old.name);
+    INSERT INTO players_fts (rowid, handle, name) VALUES (new.id, new.handle, new.name);
+END;
+"""
+
+# Rows are only rewritten (and re-indexed) when something in them changed; NULLs never overwrite known values
+UPSERT_TEAM = """
+INSERT INTO teams (id, name, logo, region, updated_at) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    name = excluded.name,
+    logo = COALESCE(excluded.logo, teams.logo),
+    region = COALESCE(excluded.region, teams.region),
+    updated_at = excluded.updated_at
+WHERE teams.name IS NOT excluded.name
+    OR (excluded.logo IS NOT NULL AND teams.logo IS NOT excluded.logo)
+    OR (excluded.region IS NOT NULL AND teams.region IS NOT excluded.region)
+"""
+
+UPSERT_PLAYER = """
+INSERT INTO players (id, handle, name, country, region, team_id, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    handle = excluded.handle,
+    name = COALESCE(excluded.name, players.name),
+    country = COALESCE(excluded.country, players.country),
+    region = COALESCE(excluded.region, players.region),
+    team_id = COALESCE(excluded.team_id, players.team_id),
+    updated_at = excluded.updated_at
+WHERE players.handle IS NOT excluded.handle
+    OR (excluded.name IS NOT NULL AND players.name IS NOT excluded.name)
+    OR (excluded.country IS NOT NULL AND players.country IS NOT excluded.country)
+    OR (excluded.region IS NOT NULL AND players.region IS NOT excluded.region)
+    OR (excluded.team_id IS NOT NULL AND players.team_id IS NOT excluded.team_id)
+"""
+
+PLAYER_URL_ID = re.compile(r"/player/(\d+)")
+
+# Upstream filters accept more than one name for some regions; each is stored under one of them
+REGION_ALIASES = {"oceania": "oce"}
+
+def entityId(value):
+    # Upstream IDs are numeric strings; anything else can't be a row key
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def canonicalRegion(region):
+    return REGION_ALIASES.get(region, region)
+
+def rosterPlayerId(url):
+    match = PLAYER_URL_ID.search(url or "")
+    return entityId(match.group(1)) if match else None
+
+def isBusy(error):
+    # Another connection held the lock past the busy timeout. Worth skipping one operation for, not the store.
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ("locked" in message or "busy" in message)
+
+def ftsQuery(query):
+    # Every word must match as a prefix: "sen esp" -> "sen"* "esp"*
+    words = re.findall(r"\w+", query.lower())
+    return " ".join(f'"{word}"*' for word in words)
+
+class EntityStore:
+    def __init__(self, path, enabled=True):
+        self.path = path
+        self.enabled = enabled
+        self._local = threading.local()
+        self._readers = []
+        self._readersLock = threading.Lock()
+        self._writer = None
+        self._executor = None
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def writer(self):
+        # Only ever used from the writer thread
+        if self._writer is None:
+            self._writer = self.connect()
+            self._writer.executescript(SCHEMA)
+        return self._writer
+
+    def reader(self):
+        conn = getattr(self._local, "reader", None)
+        if conn is None:
+            conn = self._local.reader = self.connect()
+            conn.executescript(SCHEMA)
+            with self._readersLock:
+                self._readers.append(conn)
+        return conn
+
+    def fail(self, action, error):
+        # A broken store must never take the bot down; everything just falls back to the upstream API. A busy
+        # database (e.g. another shard's big upsert) only costs the one operation.
+        if isBusy(error):
+            print(f"⚠️ Entity store {action} skipped, the database is busy: {str(error)}")
+            return
+        print(f"⚠️ Entity store {action} failed, continuing without it: {str(error)}")
+        self.enabled = False
+
+    def runWrite(self, fn, *args):
+        if not self.enabled:
+            return
+        try:
+            conn = self.writer()
+            with conn:
+                conn.execute("BEGIN")
+                fn(conn, *args)
+        except sqlite3.Error as e:
+            self.fail("write", e)
+        except Exception as e:
+            print(f"⚠️ Entity store write skipped: {type(e).__name__}: {str(e)}")
+
+    def submit(self, fn, *args):
+        # Queue a write on the writer thread without waiting for it; the future never raises
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="entity-store")
+        return self._executor.submit(self.runWrite, fn, *args)
+
+    async def write(self, fn, *args):
+        if self.enabled:
+            await asyncio.wrap_future(self.submit(fn, *args))
+
+    def query(self, sql, params=()):
+        if not self.enabled:
+            return []
+        try:
+            return self.reader().execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            self.fail("read", e)
+            return []
+
+    # Writes (run on the writer thread with a transaction open)
+
+    @staticmethod
+    def upsertTeams(conn, rows):
+        # rows: (id, name, region) from the name refresh
+        now = time.time()
+        conn.executemany(UPSERT_TEAM, ((entityId(team_id), name, None, canonicalRegion(region), now) for team_id, name, region in rows if entityId(team_id) is not None))
+
+    @staticmethod
+    def upsertPlayers(conn, rows):
+        # rows: (id, handle, name, country, region) from the name refresh
+        now = time.time()
+        conn.executemany(UPSERT_PLAYER, (
+            (entityId(player_id), handle, name, country, canonicalRegion(region), None, now)
+            for player_id, handle, name, country, region in rows if entityId(player_id) is not None
+        ))
+
+    @staticmethod
+    def upsertTeamDetail(conn, team_id, name, logo, players, staff):
+        # players / staff: (handle, url, tag) from the team page; the roster is replaced wholesale
+        conn.execute(UPSERT_TEAM, (team_id, name, logo, None, time.time()))
+        conn.execute("DELETE FROM rosters WHERE team_id = ?", (team_id,))
+        conn.executemany(
+            "INSERT OR REPLACE INTO rosters (team_id, member, player_id, handle, role, tag) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (team_id, url or handle, rosterPlayerId(url), handle, role, tag)
+                for role, members in (("player", players), ("staff", staff))
+                for handle, url, tag in members
+            ),
+        )
+
+    @staticmethod
+    def upsertPlayerDetail(conn, player_id, handle, name, country, team_id, team_name):
+        now = time.time()
+        team_id = entityId(team_id)
+        if team_id is not None and team_name:
+            conn.execute(UPSERT_TEAM, (team_id, team_name, None, None, now))
+        conn.execute(UPSERT_PLAYER, (player_id, handle, name, country, None, team_id, now))
+
+    # Reads
+
+    def searchTeams(self, query, limit=25):
+        match = ftsQuery(query)
+        if not match:
+            return []
+        rows = self.query(
+            "SELECT teams.id, teams.name FROM teams_fts JOIN teams ON teams.id = teams_fts.rowid "
+            "WHERE teams_fts MATCH ? ORDER BY bm25(teams_fts), length(teams.name) LIMIT ?",
+            (match, limit),
+        )
+        return [{"id": str(team_id), "name": name} for team_id, name in rows]
+
+    def searchPlayers(self, query, limit=25):
+        # Matches handles and real names; handles weigh more
+        match = ftsQuery(query)
+        if not match:
+            return []
+        rows = self.query(
+            "SELECT players.id, players.handle, players.name FROM players_fts JOIN players ON players.id = players_fts.rowid "
+            "WHERE players_fts MATCH ? ORDER BY bm25(players_fts, 10.0, 1.0), length(players.handle) LIMIT ?",
+            (match, limit),
+        )
+        return [{"id": str(player_id), "name": handle, "realName": name} for player_id, handle, name in rows]
+
+    def playerTeams(self, player_id):
+        # Teams listing the player on their roster, plus the team from the player's own page
+        rows = self.query(
+            "SELECT teams.id, teams.name FROM teams WHERE teams.id IN ("
+            "SELECT team_id FROM rosters WHERE player_id = ? AND role = 'player' "
+            "UNION SELECT team_id FROM players WHERE id = ? AND team_id IS NOT NULL)",
+            (player_id, player_id),
+        )
+        return [{"id": str(team_id), "name": name} for team_id, name in rows]
+
+    def teamRegions(self, team_ids):
+        # team ID -> region from the name refresh, for the teams that have one
+        team_ids = list(team_ids)
+        regions = {}
+        for start in range(0, len(team_ids), 500):
+            chunk = team_ids[start:start + 500]
+            rows = self.query(
+                f"SELECT id, region FROM teams WHERE region IS NOT NULL AND id IN ({','.join('?' * len(chunk))})", chunk
+            )
+            # Rows written before the aliases were merged may still hold an alias
+            regions.update((team_id, canonicalRegion(region)) for team_id, region in rows)
+        return regions
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        with self._readersLock:
+            connections = self._readers + [self._writer]
+            self._readers = []
+        for conn in connections:
+            if conn is not None:
+                conn.close()
+        self._local = threading.local()
+        self._writer = None
+
+entityStore = EntityStore(ENTITY_STORE_FILE, ENTITY_STORE)
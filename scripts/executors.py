@@ -0,0 +1,30 @@
+# Managed executor for work that would otherwise block the event loop: file I/O, index builds and merges, cache
+# encoding, merging refresh results. It is a thread pool. A process pool would keep index builds off the loop's GIL,
+# but shipping a finished 100k-name index back to the parent costs the loop about as much as the build itself
+# does from a thread, which yields the GIL every few milliseconds.
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+IO_WORKERS = int(os.getenv("IO_WORKERS", "4"))
+# Autocomplete searches an index this large on a thread; below it the hop costs more than the search
+AUTOCOMPLETE_OFFLOAD_MIN = int(os.getenv("AUTOCOMPLETE_OFFLOAD_MIN", "20000"))
+
+_ioExecutor = None
+
+def ioExecutor():
+    global _ioExecutor
+    if _ioExecutor is None:
+        _ioExecutor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="vctbot-io")
+    return _ioExecutor
+
+async def runIo(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(ioExecutor(), partial(fn, *args))
+
+def shutdownExecutors():
+    global _ioExecutor
+    if _ioExecutor is not None:
+        _ioExecutor.shutdown(wait=True, cancel_futures=True)
+        _ioExecutor = None
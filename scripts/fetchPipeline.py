@@ -0,0 +1,199 @@
+# Bounded-concurrency fetch pipeline for the bulk name refreshes.
+# Every request gets a timeout and jittered exponential retries; a per-key circuit breaker stops hammering a
+# failing region and the last good snapshot for that key is served instead of an empty result.
+# Requests can be conditional: validators (ETag / Last-Modified / content digest) are kept per key, and a fetch
+# that finds nothing new returns UNCHANGED so the caller can skip re-processing that key. A response's validators
+# are only remembered once its body has been parsed and projected, so a body that fails to parse is fetched again
+# in full rather than matched as unchanged.
+
+import asyncio
+import os
+import random
+import time
+
+from scripts.metrics import refreshRegionRecords, refreshRegionSeconds, refreshRegionStatus
+from scripts.upstreamScheduler import upstreamScheduler
+
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "4"))
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "30"))
+FETCH_RETRIES = int(os.getenv("FETCH_RETRIES", "3"))
+FETCH_BACKOFF_BASE = float(os.getenv("FETCH_BACKOFF_BASE", "1"))
+FETCH_BACKOFF_MAX = float(os.getenv("FETCH_BACKOFF_MAX", "20"))
+BREAKER_THRESHOLD = int(os.getenv("BREAKER_THRESHOLD", "3"))  # consecutive failed fetches before opening
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "900"))  # seconds to stay open before trying again
+
+# Returned by a fetch function when upstream reports (or the digest shows) the data hasn't changed
+UNCHANGED = object()
+
+class UpstreamError(Exception):
+    def __init__(self, status, message=None):
+        super().__init__(message or f"Status {status}")
+        self.status = status
+
+    @property
+    def retryable(self):
+        return self.status == 429 or self.status >= 500
+
+class CircuitBreaker:
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.openUntil = 0
+
+    def allow(self):
+        # Closed, or open long enough that one trial request may go through
+        return time.monotonic() >= self.openUntil
+
+    def isOpen(self):
+        return self.failures >= self.threshold
+
+    def recordSuccess(self):
+        self.failures = 0
+        self.openUntil = 0
+
+    def recordFailure(self):
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.openUntil = time.monotonic() + self.cooldown
+
+class Validator:
+    __slots__ = ("etag", "lastModified", "digest")
+
+    def __init__(self, etag, lastModified, digest):
+        self.etag = etag
+        self.lastModified = lastModified
+        self.digest = digest
+
+    def headers(self):
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.lastModified:
+            headers["If-Modified-Since"] = self.lastModified
+        return headers
+
+class Fetched:
+    # What a fetch function returns for a 200 response: the parsed data (or UNCHANGED when the digest matches the
+    # snapshot) and the validators to remember once that data has been stored
+    __slots__ = ("data", "validator")
+
+    def __init__(self, data, headers, digest):
+        self.data = data
+        self.validator = Validator(headers.get("ETag"), headers.get("Last-Modified"), digest)
+
+class FetchResult:
+    __slots__ = ("key", "data", "ok", "fromSnapshot", "elapsed", "attempts", "error", "changed")
+
+    def __init__(self, key, data, ok, fromSnapshot, elapsed, attempts, error=None, changed=True):
+        self.key = key
+        self.data = data
+        self.ok = ok
+        self.fromSnapshot = fromSnapshot
+        self.elapsed = elapsed
+        self.attempts = attempts
+        self.error = error
+        self.changed = changed  # False when upstream had nothing new; data is then the previous snapshot
+
+    @property
+    def status(self):
+        if self.ok:
+            return "ok" if self.changed else "unchanged"
+        return "snapshot" if self.fromSnapshot else "failed"
+
+def backoffDelay(attempt, base=FETCH_BACKOFF_BASE, cap=FETCH_BACKOFF_MAX):
+    # Exponential backoff with jitter so retries from several regions don't line up
+    return min(cap, base * 2 ** attempt) * random.uniform(0.5, 1)
+
+class FetchPipeline:
+    def __init__(self, name, concurrency=FETCH_CONCURRENCY, timeout=FETCH_TIMEOUT, retries=FETCH_RETRIES, project=None):
+        self.name = name
+        self.timeout = timeout
+        self.retries = retries
+        self.project = project  # trims a raw response down to what is worth keeping as a snapshot
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.breakers = {}
+        self.snapshots = {}
+        self.validators = {}
+
+    def breaker(self, key):
+        if key not in self.breakers:
+            self.breakers[key] = CircuitBreaker()
+        return self.breakers[key]
+
+    def conditionalHeaders(self, key):
+        # Only worth asking "has it changed?" when there is a snapshot to fall back on if it hasn't
+        validator = self.validators.get(key)
+        if validator is None or key not in self.snapshots:
+            return {}
+        return validator.headers()
+
+    def isUnchanged(self, key, digest):
+        # True if a 200 response's body is identical to the snapshot's
+        previous = self.validators.get(key)
+        return previous is not None and previous.digest == digest and key in self.snapshots
+
+    async def attempt(self, fn):
+        async with self.semaphore:
+            # Waiting for a rate-limit slot doesn't count against the request timeout
+            await upstreamScheduler.acquire("bulk")
+            return await asyncio.wait_for(fn(), self.timeout)
+
+    async def fetch(self, key, fn):
+        # fn is a zero-argument coroutine factory that returns data (bare, UNCHANGED or wrapped in Fetched) or raises
+        breaker = self.breaker(key)
+        started = time.monotonic()
+        attempts = 0
+        error = None
+
+        if breaker.allow():
+            for attempt in range(self.retries + 1):
+                attempts += 1
+                try:
+                    data = await self.attempt(fn)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    error = e
+                    if isinstance(e, UpstreamError) and not e.retryable:
+                        break
+                    if attempt < self.retries:
+                        await asyncio.sleep(backoffDelay(attempt))
+                    continue
+
+                validator = None
+                if isinstance(data, Fetched):
+                    data, validator = data.data, data.validator
+                if data is UNCHANGED:
+                    if validator is not None:
+                        self.validators[key] = validator
+                    breaker.recordSuccess()
+                    return FetchResult(key, self.snapshots.get(key), True, False, time.monotonic() - started, attempts, changed=False)
+                if self.project is not None:
+                    data = self.project(data)
+                breaker.recordSuccess()
+                self.snapshots[key] = data
+                if validator is not None:
+                    self.validators[key] = validator
+                return FetchResult(key, data, True, False, time.monotonic() - started, attempts)
+
+            breaker.recordFailure()
+        else:
+            error = UpstreamError(0, "circuit open")
+
+        snapshot = self.snapshots.get(key)
+        return FetchResult(key, snapshot, False, snapshot is not None, time.monotonic() - started, attempts, error)
+
+    def report(self, results):
+        # Per-key timing, slowest first, so the bottleneck region is the first line
+        for result in sorted(results, key=lambda r: r.elapsed, reverse=True):
+            count = len(result.data) if result.data is not None else 0
+            refreshRegionRecords.set(count, cache=self.name, region=result.key)
+            refreshRegionSeconds.set(result.elapsed, cache=self.name, region=result.key)
+            refreshRegionStatus.inc(cache=self.name, region=result.key, status=result.status)
+            line = f"⏱️ {self.name} {result.key}: {result.elapsed:.2f}s, {result.attempts} attempt(s), {count} records [{result.status}]"
+            if result.error is not None and not result.ok:
+                line += f" ({type(result.error).__name__}: {str(result.error) or 'timeout'})"
+            if self.breaker(result.key).isOpen():
+                line += " - circuit open"
+            print(line)
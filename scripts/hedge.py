@@ -0,0 +1,31 @@
+# Hedged requests: if the first attempt hasn't answered within a delay, fire an identical second one and take
+# whichever finishes first. Trims the tail latency caused by one slow connection or upstream worker.
+
+import asyncio
+import os
+
+HEDGE_AFTER = float(os.getenv("HEDGE_AFTER", "1.0"))  # seconds; 0 disables hedging
+
+async def hedged(fn, delay=HEDGE_AFTER):
+    # fn is a zero-argument coroutine factory; it is called at most twice
+    first = asyncio.ensure_future(fn())
+    if delay <= 0:
+        return await first
+
+    # Waited on inside the try, so a caller cancelled while waiting (timeout, shutdown) cancels the first attempt too
+    pending = {first}
+    try:
+        done, pending = await asyncio.wait(pending, timeout=delay)
+        if done:
+            return first.result()
+
+        pending.add(asyncio.ensure_future(fn()))
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # A failed attempt only counts if the other one fails too
+            for task in sorted(done, key=lambda task: task.exception() is not None):
+                if task.exception() is None or not pending:
+                    return task.result()
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,72 @@
+# Shared aiohttp session for every call to the VLR API.
+# One pooled, keep-alive connector lives for the lifetime of the bot instead of a new session per request.
+
+import aiohttp
+import os
+import re
+import time
+
+from scripts.metrics import upstreamLatency, upstreamRequests
+
+API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:5000")
+
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "30"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "60"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+
+_session = None
+
+def endpointLabel(url):
+    # /api/v1/teams/123?x=y -> /api/v1/teams/{id}, so metrics don't get one series per entity
+    return re.sub(r"/\d+(?=/|$)", "/{id}", url.path)
+
+async def onRequestStart(session, context, params):
+    context.started = time.perf_counter()
+
+async def onRequestEnd(session, context, params):
+    endpoint = endpointLabel(params.url)
+    upstreamLatency.observe(time.perf_counter() - context.started, endpoint=endpoint)
+    upstreamRequests.inc(endpoint=endpoint, status=params.response.status)
+
+async def onRequestException(session, context, params):
+    endpoint = endpointLabel(params.url)
+    upstreamLatency.observe(time.perf_counter() - context.started, endpoint=endpoint)
+    upstreamRequests.inc(endpoint=endpoint, status=type(params.exception).__name__)
+
+def createTraceConfig():
+    traceConfig = aiohttp.TraceConfig()
+    traceConfig.on_request_start.append(onRequestStart)
+    traceConfig.on_request_end.append(onRequestEnd)
+    traceConfig.on_request_exception.append(onRequestException)
+    return traceConfig
+
+def createSession():
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_POOL_LIMIT,
+        limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+        use_dns_cache=True,
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=None,
+        sock_connect=HTTP_CONNECT_TIMEOUT,
+        sock_read=HTTP_READ_TIMEOUT,
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=timeout, trace_configs=[createTraceConfig()])
+
+def getSession():
+    # Created lazily so it binds to the running event loop
+    global _session
+    if _session is None or _session.closed:
+        _session = createSession()
+    return _session
+
+async def closeSession():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
@@ -0,0 +1,116 @@
+# Incremental JSON parsing for large upstream responses.
+# Yields the elements of one top-level array (e.g. "data") as the body arrives, so a limit=all response
+# never has to be held in memory as a whole.
+
+import codecs
+import json
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+# What may follow a complete number or literal; anything else (".", "e", digits...) means it was cut off
+_DELIMITERS = _WHITESPACE + ",]}:"
+
+class JsonStreamError(ValueError):
+    pass
+
+class _Buffer:
+    def __init__(self, chunks):
+        self.chunks = chunks.__aiter__()
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.exhausted = False
+
+    async def fill(self):
+        # Append the next chunk, dropping what has already been consumed. Returns False at end of stream.
+        if self.exhausted:
+            return False
+        try:
+            chunk = await self.chunks.__anext__()
+        except StopAsyncIteration:
+            self.exhausted = True
+            self.text = self.text[self.pos:] + self.decoder.decode(b"", final=True)
+            self.pos = 0
+            return False
+        self.text = self.text[self.pos:] + self.decoder.decode(chunk)
+        self.pos = 0
+        return True
+
+    async def skipWhitespace(self):
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text) or not await self.fill():
+                return
+
+    async def peek(self):
+        await self.skipWhitespace()
+        if self.pos >= len(self.text):
+            raise JsonStreamError("unexpected end of stream")
+        return self.text[self.pos]
+
+    async def expect(self, char):
+        if await self.peek() != char:
+            raise JsonStreamError(f"expected {char!r} at offset {self.pos}")
+        self.pos += 1
+
+    async def value(self):
+        # Decode one complete JSON value, pulling in more chunks until it parses. Strings, arrays and objects end
+        # with their closing character, but a number or literal is only known to be complete once a delimiter
+        # follows it ("1." + "5" would otherwise decode as 1), or the stream is done.
+        await self.skipWhitespace()
+        if self.pos >= len(self.text):
+            raise JsonStreamError("unexpected end of stream")
+        scalar = self.text[self.pos] not in '{["'
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+                if not scalar or self.exhausted or (end < len(self.text) and self.text[end] in _DELIMITERS):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.exhausted:
+                    raise
+            await self.fill()
+
+async def iterJsonArray(chunks, key="data"):
+    # chunks: async iterable of bytes holding a JSON object; yields each element of object[key]
+    buffer = _Buffer(chunks)
+    await buffer.expect("{")
+    if await buffer.peek() == "}":
+        return
+
+    while True:
+        name = await buffer.value()
+        await buffer.expect(":")
+        if name == key:
+            await buffer.expect("[")
+            if await buffer.peek() == "]":
+                buffer.pos += 1
+            else:
+                while True:
+                    yield await buffer.value()
+                    separator = await buffer.peek()
+                    buffer.pos += 1
+                    if separator == "]":
+                        break
+                    if separator != ",":
+                        raise JsonStreamError(f"expected ',' or ']' at offset {buffer.pos - 1}")
+        else:
+            # Other members (status, size, metadata...) are small; parse and discard them
+            await buffer.value()
+
+        separator = await buffer.peek()
+        buffer.pos += 1
+        if separator == "}":
+            return
+        if separator != ",":
+            raise JsonStreamError(f"expected ',' or '}}' at offset {buffer.pos - 1}")
+
+async def digestChunks(chunks, hasher):
+    # Pass chunks through unchanged while feeding them to a hashlib object, for change detection
+    async for chunk in chunks:
+        hasher.update(chunk)
+        yield chunk
@@ -0,0 +1,73 @@
+# Event loop watchdog: a background thread that notices when the loop stops turning and logs where it is stuck.
+# The thread posts a heartbeat callback to the loop; if it hasn't run within the threshold, the loop thread's
+# current stack is printed once for that stall, and the stall's length is recorded when the loop catches up.
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+
+from scripts.metrics import loopStallSeconds
+
+LOOP_STALL_THRESHOLD = float(os.getenv("LOOP_STALL_THRESHOLD", "0.5"))  # seconds; 0 disables the watchdog
+LOOP_WATCHDOG_INTERVAL = float(os.getenv("LOOP_WATCHDOG_INTERVAL", "0.1"))
+
+class LoopWatchdog:
+    def __init__(self, threshold=LOOP_STALL_THRESHOLD, interval=LOOP_WATCHDOG_INTERVAL):
+        self.threshold = threshold
+        self.interval = interval
+        self.loop = None
+        self.loopThread = None
+        self.thread = None
+        self.stopping = threading.Event()
+        self.pendingSince = None  # when the unanswered heartbeat was posted
+        self.answeredAt = 0.0
+
+    def start(self):
+        # Call from the event loop thread
+        if self.threshold <= 0 or self.thread is not None:
+            return
+        self.loop = asyncio.get_running_loop()
+        self.loopThread = threading.get_ident()
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self.watch, name="loop-watchdog", daemon=True)
+        self.thread.start()
+
+    def beat(self):
+        self.answeredAt = time.monotonic()
+        self.pendingSince = None
+
+    def stack(self):
+        frame = sys._current_frames().get(self.loopThread)
+        return "".join(traceback.format_stack(frame)) if frame is not None else "  (no frame)\n"
+
+    def watch(self):
+        stalledSince = None
+        while not self.stopping.wait(self.interval):
+            pendingSince = self.pendingSince
+            if pendingSince is None:
+                if stalledSince is not None:
+                    duration = self.answeredAt - stalledSince
+                    loopStallSeconds.observe(duration)
+                    print(f"🐢 Event loop recovered after a {duration:.2f}s stall")
+                    stalledSince = None
+                # Only one heartbeat in flight, so a stalled loop doesn't pile them up
+                self.pendingSince = time.monotonic()
+                try:
+                    self.loop.call_soon_threadsafe(self.beat)
+                except RuntimeError:
+                    return  # the loop is closed
+            elif stalledSince is None and time.monotonic() - pendingSince >= self.threshold:
+                stalledSince = pendingSince
+                print(f"🐢 Event loop stalled for {time.monotonic() - pendingSince:.2f}s, it is currently at:\n{self.stack()}", end="")
+
+    def stop(self):
+        if self.thread is not None:
+            self.stopping.set()
+            self.thread.join(timeout=1)
+            self.thread = None
+        self.pendingSince = None
+
+loopWatchdog = LoopWatchdog()
@@ -0,0 +1,189 @@
+# Minimal in-process metrics (counters, gauges, histograms) exposed in Prometheus text format on a local HTTP
+# endpoint, plus an event-loop lag probe.
+
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+
+from aiohttp import web
+
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))  # 0 disables the endpoint
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.5"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labelText(labelNames, values):
+    if not labelNames:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(labelNames, values))
+    return "{" + pairs + "}"
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelNames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelNames = tuple(labelNames)
+        self.values = {}
+
+    def key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelNames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, value in sorted(self.values.items()):
+            lines.extend(self.renderSeries(values, value))
+        return lines
+
+    def renderSeries(self, values, value):
+        return [f"{self.name}{_labelText(self.labelNames, values)} {value}"]
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        self.values[self.key(labels)] = value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelNames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelNames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        series = self.values.get(key)
+        if series is None:
+            # Per-bucket (non-cumulative) counts, then sum and count
+            series = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][i] += 1
+                break
+        series[1] += value
+        series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def renderSeries(self, values, series):
+        counts, total, count = series
+        lines = []
+        cumulative = 0
+        for bound, bucketCount in zip(self.buckets, counts):
+            cumulative += bucketCount
+            labels = _labelText(self.labelNames + ("le",), values + (bound,))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        lines.append(f"{self.name}_bucket{_labelText(self.labelNames + ('le',), values + ('+Inf',))} {count}")
+        lines.append(f"{self.name}_sum{_labelText(self.labelNames, values)} {total}")
+        lines.append(f"{self.name}_count{_labelText(self.labelNames, values)} {count}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+commandLatency = registry.register(Histogram("vctbot_command_seconds", "Slash command handling time", ("command",)))
+buttonLatency = registry.register(Histogram("vctbot_button_seconds", "Button click handling time", ("button",)))
+autocompleteLatency = registry.register(Histogram("vctbot_autocomplete_seconds", "Autocomplete lookup time", ("kind",)))
+upstreamLatency = registry.register(Histogram("vctbot_upstream_seconds", "Upstream VLR API request time", ("endpoint",)))
+upstreamRequests = registry.register(Counter("vctbot_upstream_requests_total", "Upstream VLR API requests", ("endpoint", "status")))
+cacheRequests = registry.register(Counter("vctbot_cache_requests_total", "Cache lookups", ("cache", "result")))
+refreshDuration = registry.register(Histogram(
+    "vctbot_refresh_seconds", "Name cache refresh time", ("cache",), buckets=(1, 5, 10, 30, 60, 120, 300, 600)
+))
+refreshRegionRecords = registry.register(Gauge("vctbot_refresh_region_records", "Records per region in the last refresh", ("cache", "region")))
+refreshRegionSeconds = registry.register(Gauge("vctbot_refresh_region_seconds", "Fetch time per region in the last refresh", ("cache", "region")))
+refreshRegionStatus = registry.register(Counter("vctbot_refresh_region_total", "Region fetch outcomes", ("cache", "region", "status")))
+upstreamQueueDepth = registry.register(Gauge("vctbot_upstream_queue_depth", "Requests waiting for an upstream slot", ("lane",)))
+upstreamQueueWait = registry.register(Histogram(
+    "vctbot_upstream_queue_seconds", "Time spent waiting for an upstream slot", ("lane", "endpoint")
+))
+nameIndexSize = registry.register(Gauge("vctbot_name_index_entries", "Entries in the resident name index", ("kind",)))
+startupPhase = registry.register(Gauge("vctbot_startup_phase_seconds", "Time spent in each startup phase", ("phase",)))
+firstCommand = registry.register(Gauge(
+    "vctbot_first_command_seconds", "Time from process start (cold) or disconnect (reconnect) to the first served command", ("start",)
+))
+loopLag = registry.register(Histogram("vctbot_event_loop_lag_seconds", "Event loop scheduling delay"))
+loopLagLast = registry.register(Gauge("vctbot_event_loop_lag_last_seconds", "Most recent event loop scheduling delay"))
+loopStallSeconds = registry.register(Histogram(
+    "vctbot_event_loop_stall_seconds", "Event loop stalls caught by the watchdog", buckets=(0.5, 1, 2.5, 5, 10, 30, 60)
+))
+
+async def measureLoopLag(interval=LOOP_LAG_INTERVAL):
+    # A sleep that wakes up late means something held the loop for the difference
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - started - interval)
+        loopLag.observe(lag)
+        loopLagLast.set(lag)
+
+async def metricsHandler(request):
+    return web.Response(
+        body=registry.render().encode("utf-8"),
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+    )
+
+_runner = None
+_lagTask = None
+
+async def startMetrics():
+    global _runner, _lagTask
+    if _lagTask is None:
+        _lagTask = asyncio.create_task(measureLoopLag())
+    if METRICS_PORT and _runner is None:
+        app = web.Application()
+        app.router.add_get("/metrics", metricsHandler)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, METRICS_HOST, METRICS_PORT).start()
+        except OSError as e:
+            # e.g. the port is taken; the bot is more important than its metrics endpoint
+            print(f"⚠️ Metrics endpoint unavailable on {METRICS_HOST}:{METRICS_PORT}, continuing without it: {str(e)}")
+            await runner.cleanup()
+            return
+        _runner = runner
+        print(f"📈 Metrics on http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+
+async def stopMetrics():
+    global _runner, _lagTask
+    if _lagTask is not None:
+        _lagTask.cancel()
+        _lagTask = None
+    if _runner is not None:
+        await _runner.cleanup()
+        _runner = None
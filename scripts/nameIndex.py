@@ -0,0 +1,326 @@
+# In-memory autocomplete index over the cached team / player names.
+# Built once when a cache is loaded; a refresh derives a new index holding only the changes (replaced or removed
+# entries are tombstoned, new ones appended) instead of rebuilding it, and the fetchers swap it in whole.
+# Results are ranked exact > prefix > word-prefix > substring > fuzzy (trigram candidates + edit distance).
+
+import heapq
+import re
+from bisect import bisect_left
+from collections import Counter
+from itertools import islice
+
+NGRAM_SIZE = 3
+
+# Upper bound on candidates ranked per tier (per name length for word prefixes), so one-letter queries stay cheap
+# on huge lists
+MAX_TIER_CANDIDATES = 100
+
+# Fuzzy matching is a fallback for typos: it only runs when the other tiers found fewer than FUZZY_BELOW names
+# for a query of at least FUZZY_MIN_QUERY characters. It checks the edit distance of the MAX_FUZZY_CANDIDATES names
+# sharing the most trigrams, and skips trigrams too common to be worth counting.
+FUZZY_BELOW = 3
+FUZZY_MIN_QUERY = 4
+MAX_FUZZY_CANDIDATES = 40
+MAX_FUZZY_POSTING = 5000
+
+WORD_SPLIT = re.compile(r"[\s\-_.]+")
+
+# Share of tombstoned + appended entries past which a change set rebuilds the index from scratch
+COMPACT_RATIO = 0.1
+
+def editDistance(a, b, maxDistance):
+    # Levenshtein distance, giving up early once every cell in a row exceeds maxDistance
+    if abs(len(a) - len(b)) > maxDistance:
+        return maxDistance + 1
+    previous = list(range(len(b) + 1))
+    for i, charA in enumerate(a, 1):
+        current = [i]
+        for j, charB in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (charA != charB)
+            ))
+        if min(current) > maxDistance:
+            return maxDistance + 1
+        previous = current
+    return previous[-1]
+
+def allowedEdits(query):
+    if len(query) <= 4:
+        return 1
+    if len(query) <= 8:
+        return 2
+    return 3
+
+def wordsOf(names):
+    # (word, position) for every word after the first in each (position, lowered name)
+    words = []
+    for i, name in names:
+        for word in WORD_SPLIT.split(name)[1:]:
+            if word:
+                words.append((word, i))
+    return words
+
+def gramsOf(names):
+    # n-gram -> ascending positions for each (position, lowered name), positions given in ascending order
+    grams = {}
+    for i, name in names:
+        seen = set()
+        for size in range(1, NGRAM_SIZE + 1):
+            for start in range(len(name) - size + 1):
+                gram = name[start:start + size]
+                if gram not in seen:
+                    seen.add(gram)
+                    grams.setdefault(gram, []).append(i)
+    return grams
+
+def bucketed(pairs, names):
+    # Sorted (key, position) pairs and their parallel key list per length of the position's name, so prefix tiers
+    # can walk names shortest first
+    buckets = {}
+    for pair in sorted(pairs):
+        bucket = buckets.setdefault(len(names[pair[1]]), ([], []))
+        bucket[0].append(pair)
+        bucket[1].append(pair[0])
+    return buckets
+
+def mergeBuckets(buckets, names, additions):
+    # Copy of `buckets` with a few (key, position) pairs merged in; untouched buckets are shared
+    byLength = {}
+    for pair in additions:
+        byLength.setdefault(len(names[pair[1]]), []).append(pair)
+    merged = dict(buckets)
+    for length, pairs in byLength.items():
+        merged[length] = mergeSorted(*buckets.get(length, ([], [])), pairs)
+    return merged
+
+def mergeSorted(pairs, keys, additions):
+    # Insert a few (key, position) pairs into a sorted pair list and its parallel key list, copying the
+    # untouched runs in between as slices
+    if not additions:
+        return pairs, keys
+    newPairs, newKeys = [], []
+    previous = 0
+    for pair in sorted(additions):
+        at = bisect_left(pairs, pair, lo=previous)
+        newPairs += pairs[previous:at]
+        newKeys += keys[previous:at]
+        newPairs.append(pair)
+        newKeys.append(pair[0])
+        previous = at
+    newPairs += pairs[previous:]
+    newKeys += keys[previous:]
+    return newPairs, newKeys
+
+class NameIndex:
+    def __init__(self, entries):
+        self.entries = [entry for entry in entries if entry.get("name") and entry.get("id")]
+        self.lowered = [entry["name"].lower() for entry in self.entries]
+        self.byId = {entry["id"]: i for i, entry in enumerate(self.entries)}
+        self.dead = frozenset()  # positions of replaced or removed entries, skipped by every lookup
+
+        # Exact lookups
+        self.exact = {}
+        for i, name in enumerate(self.lowered):
+            self.exact.setdefault(name, []).append(i)
+
+        # Sorted (lowered name, position) pairs for prefix lookups via bisect, bucketed by name length so the
+        # shortest matches are found first however many longer names sort ahead of them
+        self.names = bucketed(((name, i) for i, name in enumerate(self.lowered)), self.lowered)
+
+        # Same again for every word after the first, e.g. "gaming" in "sen gaming" (bucketed by the whole name's length)
+        self.words = bucketed(wordsOf(enumerate(self.lowered)), self.lowered)
+
+        # n-gram -> positions (ascending) for substring and fuzzy lookups. Grams of every length up to
+        # NGRAM_SIZE are kept so one and two character queries have a posting list too.
+        self.grams = gramsOf(enumerate(self.lowered))
+
+    def __len__(self):
+        return len(self.entries) - len(self.dead)
+
+    def liveEntries(self):
+        if not self.dead:
+            return list(self.entries)
+        return [entry for i, entry in enumerate(self.entries) if i not in self.dead]
+
+    def updated(self, entries):
+        # Index holding exactly `entries`, derived from this one by their differences; self if nothing changed
+        byId = self.byId
+        current = self.entries
+        upserts = []
+        ids = set()
+        for entry in entries:
+            entity_id = entry.get("id")
+            name = entry.get("name")
+            if not entity_id or not name:
+                continue
+            ids.add(entity_id)
+            i = byId.get(entity_id)
+            if i is None or current[i]["name"] != name:
+                upserts.append(entry)
+        removed = byId.keys() - ids
+        if not upserts and not removed:
+            return self
+        return self.withChanges(upserts, removed)
+
+    def withChanges(self, upserts, removedIds=()):
+        # New index with `upserts` added or renamed and `removedIds` dropped. The structures are copied, not
+        # shared, so this one stays valid for lookups already holding it.
+        upserts = [entry for entry in upserts if entry.get("name") and entry.get("id")]
+        changed = {entry["id"] for entry in upserts} | set(removedIds)
+        dead = self.dead | {self.byId[entity_id] for entity_id in changed if entity_id in self.byId}
+
+        if len(dead) + len(upserts) > COMPACT_RATIO * len(self.entries):
+            return NameIndex([entry for i, entry in enumerate(self.entries) if i not in dead] + upserts)
+
+        start = len(self.entries)
+        added = [(start + k, entry["name"].lower()) for k, entry in enumerate(upserts)]
+
+        index = NameIndex.__new__(NameIndex)
+        index.entries = self.entries + upserts
+        index.lowered = self.lowered + [name for _, name in added]
+        index.byId = dict(self.byId)
+        for entity_id in changed:
+            index.byId.pop(entity_id, None)
+        index.byId.update((entry["id"], start + k) for k, entry in enumerate(upserts))
+        index.dead = frozenset(dead)
+
+        index.exact = dict(self.exact)
+        for i, name in added:
+            index.exact[name] = index.exact.get(name, []) + [i]
+
+        index.names = mergeBuckets(self.names, index.lowered, [(name, i) for i, name in added])
+        index.words = mergeBuckets(self.words, index.lowered, wordsOf(added))
+
+        # New positions are the highest, so appending keeps posting lists ascending
+        index.grams = dict(self.grams)
+        for gram, positions in gramsOf(added).items():
+            index.grams[gram] = self.grams.get(gram, []) + positions
+        return index
+
+    def first(self, limit):
+        if not self.dead:
+            return self.entries[:limit]
+        return list(islice((entry for i, entry in enumerate(self.entries) if i not in self.dead), limit))
+
+    def rankKey(self, i):
+        # Within a tier, shorter (closer) names first, then alphabetical
+        return (len(self.lowered[i]), self.lowered[i])
+
+    def live(self, positions, exclude):
+        # Positions that are neither tombstoned nor in `exclude`, filtered before any cap is applied
+        dead = self.dead
+        return (i for i in positions if i not in exclude and i not in dead)
+
+    def best(self, positions, limit, exclude):
+        return heapq.nsmallest(limit, islice(self.live(positions, exclude), MAX_TIER_CANDIDATES), key=self.rankKey)
+
+    def window(self, bucket, query):
+        # Positions in a bucket whose key starts with query, in key order and each position once
+        pairs, keys = bucket
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + "\uffff", lo=start)
+        seen = set()
+        for j in range(start, end):
+            i = pairs[j][1]
+            if i not in seen:
+                seen.add(i)
+                yield i
+
+    def prefix(self, query, limit, exclude=()):
+        # Buckets shortest first, and each is alphabetical, so the first `limit` matches are the best ranked
+        found = []
+        for length in sorted(self.names):
+            if length < len(query):
+                continue
+            found += islice(self.live(self.window(self.names[length], query), exclude), limit - len(found))
+            if len(found) >= limit:
+                break
+        return found
+
+    def wordPrefix(self, query, limit, exclude=()):
+        # A bucket is ordered by word rather than name, so its matches are ranked (up to MAX_TIER_CANDIDATES of them)
+        found = []
+        for length in sorted(self.words):
+            if length <= len(query):
+                continue
+            found += self.best(self.window(self.words[length], query), limit - len(found), exclude)
+            if len(found) >= limit:
+                break
+        return found
+
+    def substring(self, query, limit, exclude=()):
+        if len(query) <= NGRAM_SIZE:
+            candidates = self.grams.get(query, [])
+        else:
+            # Walk the rarest gram's posting list and verify each candidate
+            postings = []
+            for start in range(len(query) - NGRAM_SIZE + 1):
+                posting = self.grams.get(query[start:start + NGRAM_SIZE])
+                if posting is None:
+                    return []
+                postings.append(posting)
+            candidates = min(postings, key=len)
+        return self.best((i for i in candidates if query in self.lowered[i]), limit, exclude)
+
+    def fuzzy(self, query, limit, exclude=()):
+        if len(query) < max(NGRAM_SIZE, FUZZY_MIN_QUERY):
+            return []
+
+        shared = Counter()
+        for start in range(len(query) - NGRAM_SIZE + 1):
+            posting = self.grams.get(query[start:start + NGRAM_SIZE], [])
+            if len(posting) <= MAX_FUZZY_POSTING:
+                shared.update(posting)
+        if self.dead or exclude:
+            shared = Counter({i: shared[i] for i in self.live(shared, exclude)})
+
+        # Most shared trigrams first. Ties are common, so among the names tied at the cut-off, those with the
+        # query's first letter (typos are rarely there) and a length closer to the query's win, then alphabetically.
+        top = shared.most_common(MAX_FUZZY_CANDIDATES)
+        if not top:
+            return []
+        cutoff = top[-1][1]
+        candidates = [i for i, count in top if count > cutoff]
+        tied = [i for i, count in shared.items() if count == cutoff]
+        lowered = self.lowered
+        first = query[0]
+        size = len(query)
+        candidates += heapq.nsmallest(
+            MAX_FUZZY_CANDIDATES - len(candidates), tied,
+            key=lambda i: (lowered[i][:1] != first, abs(len(lowered[i]) - size), lowered[i]),
+        )
+
+        maxDistance = allowedEdits(query)
+        scored = []
+        for i in candidates:
+            # Compared against the name's opening, so partially typed names match too
+            distance = editDistance(query, self.lowered[i][:len(query)], maxDistance)
+            if distance <= maxDistance:
+                scored.append((distance, -shared[i], self.rankKey(i), i))
+        scored.sort()
+        return [i for *_, i in scored[:limit]]
+
+    def search(self, query, limit=25):
+        query = query.strip().lower() if query else ""
+        if not query:
+            return self.first(limit)
+
+        positions = []
+        seen = set()
+        tiers = (
+            lambda remaining: sorted(self.live(self.exact.get(query, []), seen), key=self.rankKey)[:remaining],
+            lambda remaining: self.prefix(query, remaining, seen),
+            lambda remaining: self.wordPrefix(query, remaining, seen),
+            lambda remaining: self.substring(query, remaining, seen),
+        )
+        for tier in tiers:
+            if len(positions) >= limit:
+                break
+            for i in tier(limit - len(positions)):
+                positions.append(i)
+                seen.add(i)
+        if len(positions) < min(FUZZY_BELOW, limit):
+            positions += self.fuzzy(query, limit - len(positions), seen)
+        return [self.entries[i] for i in positions]
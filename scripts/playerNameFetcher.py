@@ -1,108 +1,226 @@
 # Script to grab all player names from the VLR API and save them into a dictionary.
 
-import aiohttp
 import time
-import json
 import os
 import asyncio
+import hashlib
+import json
+
+from scripts.nameIndex import NameIndex
+from scripts.cacheFormat import buildNameMappings, loadNameCache, saveNameCache
+from scripts.httpClient import API_BASE_URL, getSession
+from scripts.singleFlight import upstreamFlights
+from scripts.fetchPipeline import UNCHANGED, Fetched, FetchPipeline, UpstreamError
+from scripts.metrics import nameIndexSize
+from scripts.entityStore import entityStore
+from scripts.executors import runIo
+from scripts.upstreamScheduler import upstreamScheduler
+from scripts.jsonStream import STREAM_CHUNK_SIZE, digestChunks, iterJsonArray
 
 CACHE_DIR = os.getenv("CACHE_DIR", ".")
-CACHE_FILE = os.path.join(CACHE_DIR, "player_cache.json")
-CACHE_EXPIRY = 86400  # 24 hours in seconds
+CACHE_FILE = os.path.join(CACHE_DIR, "player_cache.bin")
+LEGACY_CACHE_FILE = os.path.join(CACHE_DIR, "player_cache.json")  # read as a fallback, migrated on load
+CACHE_EXPIRY = int(os.getenv("NAME_CACHE_EXPIRY", "3600"))  # 1 hour; conditional refreshes keep this cheap
 
-API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:5000")
+# Parse limit=all responses incrementally and keep only id/name per player, instead of loading every
+# region's full stats payload at once
+STREAM_INGEST = os.getenv("STREAM_INGEST", "1") == "1"
 
 REGIONS = ['na', 'eu', 'ap', 'jp', 'br', 'oce', 'gc', 'la-s', 'la-n', 'oceania', 'mena']
 
+# Resident autocomplete index, replaced (never mutated) whenever the cache is loaded or refreshed
+_playerIndex = NameIndex([])
+_playerCacheTimestamp = 0
+
+def getPlayerIndex():
+    return _playerIndex
+
+def getPlayerCacheTimestamp():
+    return _playerCacheTimestamp
+
+async def setPlayerIndex(nameList, timestamp):
+    global _playerIndex, _playerCacheTimestamp
+    # Built on a thread: from scratch the first time, after that by applying only the differences (an unchanged
+    # list keeps the current index)
+    if len(_playerIndex):
+        _playerIndex = await runIo(_playerIndex.updated, nameList)
+    else:
+        _playerIndex = await runIo(NameIndex, nameList)
+    _playerCacheTimestamp = timestamp
+    nameIndexSize.set(len(_playerIndex), kind="player")
+
+def projectPlayer(player):
+    # Only the fields the name cache and entity store need are kept, both for the index and as the pipeline's
+    # per-region snapshot
+    user = player.get("user")
+    return {
+        "id": player.get("id"),
+        "name": user or player.get("name"),
+        "realName": player.get("name") if user else None,
+        "country": player.get("country"),
+    }
+
+playerPipeline = FetchPipeline("players")
+
 async def fetchPlayersByRegion(session, region):
+    # Overlapping refreshes share the in-flight request for a region instead of doubling up
+    return await upstreamFlights.do(
+        ("players-region", region),
+        lambda: playerPipeline.fetch(region, lambda: fetchPlayersByRegionUncoalesced(session, region))
+    )
+
+async def fetchPlayersByRegionUncoalesced(session, region):
     url = f"{API_BASE_URL}/api/v1/players?timespan=all&limit=all&region={region}"
     
-    try:
-        async with session.get(url) as response:
-            if response.status == 200:
-                data = await response.json()
-                return data.get("data", [])
-            else:
-                print(f"⚠️ Error fetching players for region {region}: Status {response.status}")
-                return []
-    except Exception as e:
-        print(f"⚠️ Exception fetching players for region {region}: {str(e)}")
-        return []
+    hasher = hashlib.blake2b(digest_size=16)
+    async with session.get(url, headers=playerPipeline.conditionalHeaders(region)) as response:
+        if response.status == 304:
+            return UNCHANGED
+        if response.status != 200:
+            raise UpstreamError(response.status)
+
+        if STREAM_INGEST:
+            chunks = digestChunks(response.content.iter_chunked(STREAM_CHUNK_SIZE), hasher)
+            players = [projectPlayer(player) async for player in iterJsonArray(chunks, "data")]
+        else:
+            body = await response.read()
+            hasher.update(body)
+            players = None
+
+    # Servers that ignore the validators still get caught by the content digest
+    digest = hasher.digest()
+    if playerPipeline.isUnchanged(region, digest):
+        return Fetched(UNCHANGED, response.headers, digest)
+    if players is None:
+        players = [projectPlayer(player) for player in json.loads(body).get("data", [])]
+    return Fetched(players, response.headers, digest)
 
 
 async def fetchPlayersByChunks(session):
     """Fetch players in chunks to handle API limitations"""
     url = f"{API_BASE_URL}/api/v1/players?limit=all"
     
+    await upstreamScheduler.acquire("bulk")
     async with session.get(url) as response:
         if response.status == 200:
             data = await response.json()
             return data.get("data", []), data.get("metadata", {}).get("total", 0)
     return [], 0
 
-async def fetchAllPlayerNames():
+def collectPlayers(all_region_results, currentIndex):
+    # Runs on a thread: dedupes every region's players by ID
     playerNameMappings = {}
     playersNameList = []
     fetched_player_ids = set()
-    
-    async with aiohttp.ClientSession() as session:
-        region_tasks = [fetchPlayersByRegion(session, region) for region in REGIONS]
-        all_region_results = await asyncio.gather(*region_tasks)
-        
-        for i, players in enumerate(all_region_results):
-            region = REGIONS[i]
-            print(f"Found {len(players)} players in region {region}")
+
+    for result in all_region_results:
+        for player in result.data or []:
+            player_id = player.get("id")
+            player_name = player.get("name")
             
-            for player in players:
-                player_id = player.get("id")
-                player_name = player.get("user") or player.get("name")
-                
-                if player_id and player_name and player_id not in fetched_player_ids:
-                    playerNameMappings[player_name.lower()] = player_id
-                    playersNameList.append({"name": player_name, "id": player_id})
-                    fetched_player_ids.add(player_id)
+            if player_id and player_name and player_id not in fetched_player_ids:
+                playerNameMappings[player_name.lower()] = player_id
+                playersNameList.append({"name": player_name, "id": player_id})
+                fetched_player_ids.add(player_id)
+
+    # A region that failed with no snapshot to fall back on keeps its players from the current cache
+    if any(result.data is None for result in all_region_results):
+        for player in currentIndex.liveEntries():
+            if player["id"] not in fetched_player_ids:
+                playerNameMappings[player["name"].lower()] = player["id"]
+                playersNameList.append(player)
+                fetched_player_ids.add(player["id"])
+    return playerNameMappings, playersNameList
+
+async def fetchAllPlayerNames():
+    session = getSession()
+    region_tasks = [fetchPlayersByRegion(session, region) for region in REGIONS]
+    all_region_results = await asyncio.gather(*region_tasks)
     
-    cache = {
-        "timestamp": time.time(),
-        "playerNameMappings": playerNameMappings,
-        "playersNameList": playersNameList
-    }
+    playerPipeline.report(all_region_results)
 
-    with open(CACHE_FILE, "w") as f:
-        json.dump(cache, f, indent=2)
+    if not any(result.data for result in all_region_results):
+        raise UpstreamError(0, "every player region failed, keeping the previous cache")
+
+    if len(getPlayerIndex()) and all(result.ok and not result.changed for result in all_region_results):
+        return await touchPlayerCache()
+    
+    playerNameMappings, playersNameList = await runIo(collectPlayers, all_region_results, getPlayerIndex())
     
+    timestamp = time.time()
+    await runIo(saveNameCache, CACHE_FILE, LEGACY_CACHE_FILE, "playersNameList", timestamp, playersNameList)
+    
+    await setPlayerIndex(playersNameList, timestamp)
+
+    # Unchanged players are skipped by the upsert, so this mostly costs a read per row
+    await entityStore.write(entityStore.upsertPlayers, [
+        (player.get("id"), player.get("name"), player.get("realName"), player.get("country"), result.key)
+        for result in all_region_results if result.changed
+        for player in result.data or []
+        if player.get("name")
+    ])
+
     print(f"Fetched and cached {len(playersNameList)} player names.")
     return playerNameMappings, playersNameList
 
+async def touchPlayerCache():
+    # Nothing changed upstream: keep the index and only record that it is current
+    global _playerCacheTimestamp
+    timestamp = time.time()
+    playersNameList = getPlayerIndex().liveEntries()
+    await runIo(saveNameCache, CACHE_FILE, LEGACY_CACHE_FILE, "playersNameList", timestamp, playersNameList)
+    _playerCacheTimestamp = timestamp
+    print(f"Player names unchanged upstream ({len(playersNameList)} cached).")
+    return await runIo(buildNameMappings, playersNameList), playersNameList
+
 async def getPlayerMapping():
-    if os.path.exists(CACHE_FILE):
-        try:
-            with open(CACHE_FILE, "r") as f:
-                cache = json.load(f)
-                
-            # Check if cache is still valid
-            if time.time() - cache.get("timestamp", 0) < CACHE_EXPIRY:
-                return cache.get("playerNameMappings", {}), cache.get("playersNameList", [])
-            else:
-                print("🔄 Player cache expired, refreshing...")
-        except Exception as e:
-            print(f"⚠️ Error reading player cache: {str(e)}")
+    cached = await runIo(loadNameCache, CACHE_FILE, LEGACY_CACHE_FILE, "playersNameList")
+    if cached is not None:
+        timestamp, playersNameList = cached
+
+        # Check if cache is still valid
+        if time.time() - timestamp < CACHE_EXPIRY:
+            await setPlayerIndex(playersNameList, timestamp)
+            return await runIo(buildNameMappings, playersNameList), playersNameList
+        else:
+            print("🔄 Player cache expired, refreshing...")
     
     # Cache doesn't exist or is expired
     return await fetchAllPlayerNames()
 
 def getCachedPlayerMappingSync():
-    if os.path.exists(CACHE_FILE):
-        try:
-            with open(CACHE_FILE, "r") as f:
-                cache = json.load(f)
-            return cache.get("playerNameMappings", {}), cache.get("playersNameList", [])
-        except Exception:
-            return {}, []
-    return {}, []
-
-# Add this to your bot's startup routine
+    # Blocking; only for callers outside the event loop
+    cached = loadNameCache(CACHE_FILE, LEGACY_CACHE_FILE, "playersNameList")
+    if cached is None:
+        return {}, []
+    _, playersNameList = cached
+    return buildNameMappings(playersNameList), playersNameList
+
+async def loadPlayerCache():
+    # Load whatever is on disk, expired or not, so autocomplete works before the first refresh
+    cached = await runIo(loadNameCache, CACHE_FILE, LEGACY_CACHE_FILE, "playersNameList")
+    if cached is None:
+        return False
+
+    timestamp, playersNameList = cached
+    await setPlayerIndex(playersNameList, timestamp)
+    return True
+
+async def reloadPlayerCache():
+    # Pick up a newer cache written by another process (the elected refresher); True if the index was replaced
+    cached = await runIo(loadNameCache, CACHE_FILE, LEGACY_CACHE_FILE, "playersNameList")
+    if cached is None or cached[0] <= _playerCacheTimestamp:
+        return False
+
+    timestamp, nameList = cached
+    await setPlayerIndex(nameList, timestamp)
+    return True
+
+# Add this to your bot's startup routine. Refreshing is left to the refresh scheduler.
 async def initializePlayerCache():
     print("🔄 Initializing player cache...")
-    await getPlayerMapping()
-    print("✅ Player cache initialized")
\ No newline at end of file
+    if not await loadPlayerCache():
+        print("⚠️ No player cache on disk yet, autocomplete will be empty until the first refresh")
+    elif time.time() - getPlayerCacheTimestamp() >= CACHE_EXPIRY:
+        print("🔄 Player cache is stale, serving it until the background refresh completes")
+    print("✅ Player cache initialized")
@@ -0,0 +1,78 @@
+# Warms the detail cache with whatever the user is likely to open next, right after a view is sent:
+# the player's team after a player view, the top roster players after a team view.
+# A small fixed pool of workers does the fetching, and its upstream requests go out in the prefetch lane, which the
+# upstream scheduler only serves once interactive requests are through, so prefetching never delays someone waiting
+# on a reply.
+
+import asyncio
+import os
+
+from scripts.detailFetcher import detailCache, requestDetail
+from scripts.metrics import cacheRequests
+from scripts.upstreamScheduler import PREFETCH as PREFETCH_LANE, upstreamLane
+
+PREFETCH = os.getenv("PREFETCH", "1") == "1"
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "2"))  # upstream requests prefetching may have in flight
+PREFETCH_QUEUE_MAX = int(os.getenv("PREFETCH_QUEUE_MAX", "200"))  # further suggestions are dropped
+PREFETCH_ROSTER_LIMIT = int(os.getenv("PREFETCH_ROSTER_LIMIT", "5"))  # roster players warmed per team view
+
+class Prefetcher:
+    def __init__(self, concurrency=PREFETCH_CONCURRENCY, queueSize=PREFETCH_QUEUE_MAX, enabled=PREFETCH):
+        self.concurrency = concurrency
+        self.queueSize = queueSize
+        self.enabled = enabled
+        self.pending = set()
+        self.queue = None
+        self.workers = []
+
+    def schedule(self, kind, entity_id):
+        if not self.enabled or not entity_id:
+            return
+        key = (kind, int(entity_id))
+        if key in self.pending:
+            return
+        entry = detailCache.get(key)
+        if entry is not None and entry.isFresh():
+            return
+
+        if self.queue is None:
+            self.queue = asyncio.Queue(self.queueSize)
+        if not self.workers:
+            self.workers = [asyncio.create_task(self.worker(self.queue)) for _ in range(self.concurrency)]
+        try:
+            self.queue.put_nowait(key)
+        except asyncio.QueueFull:
+            cacheRequests.inc(cache="prefetch", result="dropped")
+            return
+        self.pending.add(key)
+
+    async def worker(self, queue):
+        # Holds on to its own queue: stop() drops self.queue before the cancelled workers get to finish
+        while True:
+            key = await queue.get()
+            try:
+                await self.prefetch(*key)
+            except Exception as e:
+                print(f"⚠️ Prefetching {key[0]}/{key[1]} failed: {str(e)}")
+            finally:
+                self.pending.discard(key)
+                queue.task_done()
+
+    async def prefetch(self, kind, entity_id):
+        # It may have been fetched while queued
+        entry = detailCache.get((kind, entity_id))
+        if entry is not None and entry.isFresh():
+            cacheRequests.inc(cache="prefetch", result="skipped")
+            return
+        with upstreamLane(PREFETCH_LANE):
+            status, _ = await requestDetail(kind, entity_id)
+        cacheRequests.inc(cache="prefetch", result="fetched" if status == 200 else "failed")
+
+    def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        self.workers = []
+        self.queue = None
+        self.pending.clear()
+
+prefetcher = Prefetcher()
@@ -0,0 +1,120 @@
+# Background refresh of the team / player name caches.
+# Each cache gets its own job that sleeps until the cache is due (plus jitter), refreshes it, and repeats.
+# The fetchers swap the in-memory index themselves once a refresh finishes.
+# With several shard processes only the holder of a lease in the shared store refreshes; the others reload the
+# cache file it writes.
+
+import asyncio
+import os
+import random
+import time
+
+from scripts.teamNameFetcher import (
+    CACHE_EXPIRY as TEAM_CACHE_EXPIRY, fetchAllTeamNames, getTeamCacheTimestamp, getTeamIndex, reloadTeamCache
+)
+from scripts.playerNameFetcher import (
+    CACHE_EXPIRY as PLAYER_CACHE_EXPIRY, fetchAllPlayerNames, getPlayerCacheTimestamp, getPlayerIndex, reloadPlayerCache
+)
+from scripts.metrics import refreshDuration
+from scripts.sharedStore import sharedStore
+
+REFRESH_JITTER = float(os.getenv("REFRESH_JITTER", "300"))  # up to 5 minutes, so jobs (and shards) don't align
+REFRESH_RETRY_DELAY = float(os.getenv("REFRESH_RETRY_DELAY", "300"))  # wait before retrying a failed refresh
+REFRESH_LEASE_TTL = float(os.getenv("REFRESH_LEASE_TTL", "900"))  # longest a refresh may hold the lease
+REFRESH_FOLLOW_DELAY = float(os.getenv("REFRESH_FOLLOW_DELAY", "60"))  # re-check interval while another process refreshes
+
+class RefreshJob:
+    def __init__(self, name, refresh, lastRefreshed, reload, interval, isEmpty, jitter=REFRESH_JITTER):
+        self.name = name
+        self.metricLabel = name.lower().replace(" ", "_")
+        self.lease = f"refresh:{self.metricLabel}"
+        self.refresh = refresh
+        self.lastRefreshed = lastRefreshed
+        self.reload = reload
+        self.interval = interval
+        self.isEmpty = isEmpty
+        self.jitter = jitter
+        self.retryAt = 0
+        self.lock = asyncio.Lock()
+        self.task = None
+
+    def nextDelay(self):
+        due = max(self.lastRefreshed() + self.interval, self.retryAt) - time.time()
+        # With nothing to serve (no cache on disk), the first refresh shouldn't wait on the jitter
+        jitter = 0 if self.isEmpty() else random.uniform(0, self.jitter)
+        return max(0, due) + jitter
+
+    def isDue(self):
+        return time.time() >= self.lastRefreshed() + self.interval
+
+    async def reloadShared(self):
+        if await self.reload():
+            print(f"📥 {self.name} reloaded from the cache written by another process")
+
+    async def runOnce(self):
+        # Single-instance guard: a refresh already underway is never started twice
+        if self.lock.locked():
+            print(f"⏭️ {self.name} refresh already running, skipping")
+            return False
+
+        async with self.lock:
+            # Another process may have refreshed already; otherwise only the lease holder goes upstream
+            await self.reloadShared()
+            if not self.isDue():
+                return True
+            if not await sharedStore.acquireLease(self.lease, REFRESH_LEASE_TTL):
+                self.retryAt = time.time() + REFRESH_FOLLOW_DELAY
+                print(f"⏭️ {self.name} is being refreshed by another process")
+                return False
+            # It may have finished between the reload and taking the lease
+            await self.reloadShared()
+            if not self.isDue():
+                await sharedStore.releaseLease(self.lease)
+                return True
+
+            started = time.monotonic()
+            try:
+                with refreshDuration.time(cache=self.metricLabel):
+                    await self.refresh()
+            except Exception as e:
+                self.retryAt = time.time() + REFRESH_RETRY_DELAY
+                print(f"⚠️ {self.name} refresh failed: {str(e)}")
+                return False
+            finally:
+                await sharedStore.releaseLease(self.lease)
+            print(f"✅ {self.name} refreshed in {time.monotonic() - started:.1f}s")
+            return True
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.nextDelay())
+            await self.runOnce()
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+_jobs = [
+    RefreshJob(
+        "Team cache", fetchAllTeamNames, getTeamCacheTimestamp, reloadTeamCache, TEAM_CACHE_EXPIRY,
+        lambda: not len(getTeamIndex()),
+    ),
+    RefreshJob(
+        "Player cache", fetchAllPlayerNames, getPlayerCacheTimestamp, reloadPlayerCache, PLAYER_CACHE_EXPIRY,
+        lambda: not len(getPlayerIndex()),
+    ),
+]
+
+def startRefreshScheduler():
+    # Safe to call repeatedly; jobs that are already running are left alone
+    for job in _jobs:
+        job.start()
+
+def stopRefreshScheduler():
+    for job in _jobs:
+        job.stop()
@@ -0,0 +1,68 @@
+# Bounded in-memory cache for upstream detail payloads.
+# Entries carry their own TTL and a stale window; the cache is LRU-evicted by total payload size.
+
+import os
+import time
+from collections import OrderedDict
+
+DETAIL_CACHE_MAX_BYTES = int(os.getenv("DETAIL_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+DETAIL_CACHE_MAX_ENTRIES = int(os.getenv("DETAIL_CACHE_MAX_ENTRIES", "5000"))
+
+class CacheEntry:
+    __slots__ = ("value", "size", "fetchedAt", "expiresAt", "staleUntil")
+
+    def __init__(self, value, size, ttl, staleTtl):
+        now = time.monotonic()
+        self.value = value
+        self.size = size
+        self.fetchedAt = now
+        self.expiresAt = now + ttl
+        self.staleUntil = now + ttl + staleTtl
+
+    def isFresh(self):
+        return time.monotonic() < self.expiresAt
+
+    def isUsable(self):
+        return time.monotonic() < self.staleUntil
+
+class ResponseCache:
+    def __init__(self, maxBytes=DETAIL_CACHE_MAX_BYTES, maxEntries=DETAIL_CACHE_MAX_ENTRIES):
+        self.maxBytes = maxBytes
+        self.maxEntries = maxEntries
+        self.totalBytes = 0
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        # Returns the entry (fresh or stale) or None once it is past its stale window. Entries past the window
+        # stay until evicted, as a last resort for peek().
+        entry = self.entries.get(key)
+        if entry is None or not entry.isUsable():
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def peek(self, key):
+        # Whatever is held for key, however old, without touching LRU order
+        return self.entries.get(key)
+
+    def set(self, key, value, size, ttl, staleTtl):
+        self.invalidate(key)
+        entry = CacheEntry(value, size, ttl, staleTtl)
+        self.entries[key] = entry
+        self.totalBytes += size
+        self.evict()
+        return entry
+
+    def invalidate(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.totalBytes -= entry.size
+
+    def evict(self):
+        # Drop least recently used entries until both bounds hold (always keep the newest one)
+        while len(self.entries) > 1 and (self.totalBytes > self.maxBytes or len(self.entries) > self.maxEntries):
+            _, entry = self.entries.popitem(last=False)
+            self.totalBytes -= entry.size
@@ -0,0 +1,131 @@
+# Time-ordered index of upcoming matches across every team whose detail payload the bot has seen.
+# Each team detail replaces that team's part of the schedule, so the index is kept current one team at a time.
+# A match listed by both of its teams is stored once (keyed by its URL), start times are parsed once when the
+# payload comes in, and "what's on in the next N hours" is a bisect over the start times.
+
+import calendar
+import time
+from bisect import bisect_left, insort
+from datetime import datetime
+
+MATCH_TIME_FORMAT = "%a, %d %b %Y %H:%M:%S %Z"
+
+def parseMatchTime(utc):
+    # "Sun, 01 Nov 2026 18:00:00 GMT" -> epoch seconds, or None when the time is missing or TBD
+    try:
+        return calendar.timegm(datetime.strptime(utc, MATCH_TIME_FORMAT).timetuple())
+    except (TypeError, ValueError):
+        return None
+
+class ScheduledMatch:
+    __slots__ = ("url", "start", "event", "team1", "team2", "teams")
+
+    def __init__(self, url, start, event, team1, team2):
+        self.url = url
+        self.start = start
+        self.event = event
+        self.team1 = team1
+        self.team2 = team2
+        self.teams = {}  # team ID -> region (or None) of every team listing this match
+
+class ScheduleIndex:
+    def __init__(self):
+        self.matches = {}  # url -> ScheduledMatch
+        self.byTeam = {}  # team ID -> urls that team currently lists
+        self.starts = []  # sorted (start, url)
+
+    def __len__(self):
+        return len(self.matches)
+
+    def teamCount(self):
+        return len(self.byTeam)
+
+    def updateTeam(self, team_id, region, matches):
+        # matches: anything with url / start / event / team1 / team2, e.g. a snapshot's UpcomingMatch tuples.
+        # Replaces what this team contributed before; matches without a known start time are left out.
+        urls = set()
+        for match in matches:
+            if match.start is None or not match.url:
+                continue
+            urls.add(match.url)
+            entry = self.matches.get(match.url)
+            if entry is None:
+                entry = self.matches[match.url] = ScheduledMatch(match.url, match.start, match.event, match.team1, match.team2)
+                insort(self.starts, (entry.start, entry.url))
+            elif entry.start != match.start:
+                # Rescheduled
+                self.unlist(entry)
+                entry.start = match.start
+                insort(self.starts, (entry.start, entry.url))
+            entry.teams[team_id] = region
+
+        for url in self.byTeam.get(team_id, set()) - urls:
+            entry = self.matches.get(url)
+            if entry is not None:
+                entry.teams.pop(team_id, None)
+                if not entry.teams:
+                    self.remove(entry)
+
+        if urls:
+            self.byTeam[team_id] = urls
+        else:
+            self.byTeam.pop(team_id, None)
+
+    def setRegion(self, team_id, region):
+        for url in self.byTeam.get(team_id, ()):
+            self.matches[url].teams[team_id] = region
+
+    def unlist(self, entry):
+        at = bisect_left(self.starts, (entry.start, entry.url))
+        if at < len(self.starts) and self.starts[at] == (entry.start, entry.url):
+            del self.starts[at]
+
+    def remove(self, entry):
+        self.unlist(entry)
+        del self.matches[entry.url]
+        for team_id in entry.teams:
+            urls = self.byTeam.get(team_id)
+            if urls is not None:
+                urls.discard(entry.url)
+                if not urls:
+                    del self.byTeam[team_id]
+
+    def prune(self, before):
+        # Drop matches that started before `before`
+        end = bisect_left(self.starts, (before,))
+        for _, url in self.starts[:end]:
+            entry = self.matches.pop(url)
+            for team_id in entry.teams:
+                urls = self.byTeam.get(team_id)
+                if urls is not None:
+                    urls.discard(url)
+                    if not urls:
+                        del self.byTeam[team_id]
+        del self.starts[:end]
+
+    def between(self, start, end, region=None, event=None, limit=25):
+        # Matches starting in [start, end), earliest first. `region` matches any listing team's region and
+        # `event` is a case-insensitive substring of the event name.
+        event = event.lower() if event else None
+        found = []
+        for matchStart, url in self.starts[bisect_left(self.starts, (start,)):]:
+            if matchStart >= end:
+                break
+            entry = self.matches[url]
+            if region and region not in entry.teams.values():
+                continue
+            if event and event not in entry.event.lower():
+                continue
+            found.append(entry)
+            if len(found) >= limit:
+                break
+        return found
+
+    def events(self, since=None):
+        # Distinct event names of matches from `since` (default: now) on
+        since = time.time() if since is None else since
+        names = {}
+        for _, url in self.starts[bisect_left(self.starts, (since,)):]:
+            name = self.matches[url].event
+            names.setdefault(name.lower(), name)
+        return sorted(names.values())
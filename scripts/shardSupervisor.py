@@ -0,0 +1,84 @@
+# Runs the bot as several processes, each owning a slice of the shards, and restarts any that exit.
+# The processes share the name caches on disk and the SQLite store in CACHE_DIR, and only one of them refreshes.
+#   SHARD_PROCESSES=4 python -m scripts.shardSupervisor
+
+import asyncio
+import os
+import signal
+import sys
+
+import aiohttp
+from dotenv import load_dotenv
+
+load_dotenv()
+DISCORD_BOT_TOKEN = os.getenv("DISCORD_BOT_TOKEN")
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0"))  # 0 asks Discord for its recommended count
+SHARD_PROCESSES = int(os.getenv("SHARD_PROCESSES", str(os.cpu_count() or 1)))
+RESTART_DELAY = float(os.getenv("SHARD_RESTART_DELAY", "5"))
+RESTART_DELAY_MAX = 300
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))  # each process gets its own port from here up
+
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+async def recommendedShardCount():
+    headers = {"Authorization": f"Bot {DISCORD_BOT_TOKEN}"}
+    async with aiohttp.ClientSession() as session:
+        async with session.get("https://discord.com/api/v10/gateway/bot", headers=headers) as response:
+            response.raise_for_status()
+            data = await response.json()
+            return data["shards"]
+
+def assignShards(shardCount, processes):
+    # Round-robin, so guild load (which follows the shard ID) spreads evenly
+    processes = max(1, min(processes, shardCount))
+    return [list(range(index, shardCount, processes)) for index in range(processes)]
+
+class ShardProcess:
+    def __init__(self, index, shardCount, shardIds):
+        self.index = index
+        self.shardCount = shardCount
+        self.shardIds = shardIds
+        self.process = None
+        self.stopping = False
+
+    def environment(self):
+        env = dict(os.environ)
+        env["SHARD_COUNT"] = str(self.shardCount)
+        env["SHARD_IDS"] = ",".join(str(shard) for shard in self.shardIds)
+        if METRICS_PORT:
+            env["METRICS_PORT"] = str(METRICS_PORT + self.index)
+        return env
+
+    async def run(self):
+        delay = RESTART_DELAY
+        while not self.stopping:
+            print(f"🚀 Starting shards {self.shardIds} of {self.shardCount}")
+            started = asyncio.get_running_loop().time()
+            self.process = await asyncio.create_subprocess_exec(sys.executable, MAIN_SCRIPT, env=self.environment())
+            code = await self.process.wait()
+            if self.stopping:
+                break
+            if asyncio.get_running_loop().time() - started > RESTART_DELAY_MAX:
+                delay = RESTART_DELAY  # it ran fine for a while, so this isn't a crash loop
+            print(f"⚠️ Shards {self.shardIds} exited with code {code}, restarting in {delay:g}s")
+            await asyncio.sleep(delay)
+            delay = min(RESTART_DELAY_MAX, delay * 2)
+
+    def stop(self):
+        self.stopping = True
+        if self.process is not None and self.process.returncode is None:
+            self.process.terminate()
+
+async def supervise():
+    shardCount = SHARD_COUNT or await recommendedShardCount()
+    processes = [ShardProcess(index, shardCount, shardIds) for index, shardIds in enumerate(assignShards(shardCount, SHARD_PROCESSES))]
+    print(f"🧩 {shardCount} shard(s) across {len(processes)} process(es)")
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, lambda: [process.stop() for process in processes])
+
+    await asyncio.gather(*(process.run() for process in processes))
+
+if __name__ == "__main__":
+    asyncio.run(supervise())
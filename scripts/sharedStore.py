@@ -0,0 +1,179 @@
+# SQLite store shared by every bot process on the host (one per shard group).
+# Holds raw detail payloads so a team fetched by one shard is a cache hit in the others, and the leases that
+# elect a single process to run each name cache refresh. WAL mode lets readers carry on while one process writes.
+# Another process can hold the write lock for a while, so nothing here touches SQLite on the event loop: reads run
+# on the I/O threads with a connection per thread, and writes and leases go through one background thread.
+
+import asyncio
+import os
+import socket
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from scripts.entityStore import isBusy
+from scripts.executors import runIo
+
+CACHE_DIR = os.getenv("CACHE_DIR", ".")
+SHARED_STORE = os.getenv("SHARED_STORE", "1") == "1"
+SHARED_STORE_FILE = os.path.join(CACHE_DIR, "vctbot.db")
+SHARED_STORE_PRUNE_EVERY = 500  # detail writes between sweeps of expired rows
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS details (
+    kind TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    body BLOB NOT NULL,
+    expires_at REAL NOT NULL,
+    stale_until REAL NOT NULL,
+    PRIMARY KEY (kind, id)
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+class SharedStore:
+    def __init__(self, path, enabled=True):
+        self.path = path
+        self.enabled = enabled
+        self.holder = f"{socket.gethostname()}:{os.getpid()}"
+        self.writes = 0
+        self._local = threading.local()
+        self._connections = []
+        self._connectionsLock = threading.Lock()
+        self._executor = None
+
+    def connection(self):
+        # One per thread: the I/O threads read, the writer thread writes
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+            with self._connectionsLock:
+                self._connections.append(conn)
+        return conn
+
+    def submit(self, fn, *args):
+        # Queue work on the writer thread without waiting for it
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-store")
+        return self._executor.submit(fn, *args)
+
+    async def write(self, fn, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def fail(self, action, error):
+        # A broken store must never take the bot down; this process just carries on without sharing. A busy
+        # database (another process holding the write lock) only costs the one operation.
+        if isBusy(error):
+            print(f"⚠️ Shared store {action} skipped, the database is busy: {str(error)}")
+            return
+        print(f"⚠️ Shared store {action} failed, continuing without it: {str(error)}")
+        self.enabled = False
+
+    async def getDetail(self, kind, entity_id):
+        return await runIo(self.readDetail, kind, entity_id)
+
+    async def listDetails(self, kind):
+        return await runIo(self.readDetails, kind)
+
+    def putDetail(self, kind, entity_id, body, ttl, staleTtl):
+        # The caller already has the payload, so the write isn't waited for
+        if self.enabled:
+            self.submit(self.writeDetail, kind, entity_id, body, ttl, staleTtl)
+
+    async def acquireLease(self, name, ttl):
+        return await self.write(self.takeLease, name, ttl)
+
+    async def releaseLease(self, name):
+        await self.write(self.dropLease, name)
+
+    # Blocking versions of the above, run on the I/O threads (reads) or the writer thread (writes)
+
+    def readDetail(self, kind, entity_id):
+        # Returns (body, expiresAt, staleUntil) in wall-clock time, or None if missing or past its stale window
+        if not self.enabled:
+            return None
+        try:
+            row = self.connection().execute(
+                "SELECT body, expires_at, stale_until FROM details WHERE kind = ? AND id = ? AND stale_until > ?",
+                (kind, entity_id, time.time()),
+            ).fetchone()
+        except sqlite3.Error as e:
+            self.fail("read", e)
+            return None
+        return row
+
+    def readDetails(self, kind):
+        # (id, body) of every payload of a kind that is still within its stale window
+        if not self.enabled:
+            return []
+        try:
+            return self.connection().execute(
+                "SELECT id, body FROM details WHERE kind = ? AND stale_until > ?", (kind, time.time())
+            ).fetchall()
+        except sqlite3.Error as e:
+            self.fail("read", e)
+            return []
+
+    def writeDetail(self, kind, entity_id, body, ttl, staleTtl):
+        if not self.enabled:
+            return
+        now = time.time()
+        try:
+            conn = self.connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO details (kind, id, body, expires_at, stale_until) VALUES (?, ?, ?, ?, ?)",
+                (kind, entity_id, body, now + ttl, now + ttl + staleTtl),
+            )
+            self.writes += 1
+            if self.writes % SHARED_STORE_PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM details WHERE stale_until <= ?", (now,))
+        except sqlite3.Error as e:
+            self.fail("write", e)
+
+    def takeLease(self, name, ttl):
+        # True if this process holds the lease (newly taken, renewed, or the store is unavailable). False while the
+        # store is busy, which most likely means another process is writing.
+        if not self.enabled:
+            return True
+        now = time.time()
+        try:
+            cursor = self.connection().execute(
+                "INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at "
+                "WHERE leases.holder = excluded.holder OR leases.expires_at <= ?",
+                (name, self.holder, now + ttl, now),
+            )
+        except sqlite3.Error as e:
+            self.fail("lease", e)
+            return not isBusy(e)
+        return cursor.rowcount > 0
+
+    def dropLease(self, name):
+        if not self.enabled:
+            return
+        try:
+            self.connection().execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, self.holder))
+        except sqlite3.Error as e:
+            self.fail("lease release", e)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        with self._connectionsLock:
+            connections = self._connections
+            self._connections = []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+sharedStore = SharedStore(SHARED_STORE_FILE, SHARED_STORE)
@@ -0,0 +1,45 @@
+# Request coalescing: concurrent callers asking for the same key share one in-flight call.
+# The key is forgotten as soon as the call settles, so a failure is seen by every current waiter but never cached.
+# Each call queues for upstream under its own copy of the starting caller's priority, and a more urgent caller
+# joining it promotes that copy.
+
+import asyncio
+
+from scripts.upstreamScheduler import Priority, currentPriority, upstreamPriority, upstreamScheduler
+
+async def runWithPriority(priority, fn):
+    with upstreamPriority(priority):
+        return await fn()
+
+class SingleFlight:
+    def __init__(self):
+        self.inFlight = {}  # key -> (task, priority)
+
+    def __len__(self):
+        return len(self.inFlight)
+
+    async def do(self, key, fn):
+        flight = self.inFlight.get(key)
+        if flight is None:
+            # A copy, so promoting this call doesn't promote the rest of the starting caller's work
+            started = currentPriority()
+            priority = Priority(started.lane, started.guild)
+            task = asyncio.ensure_future(runWithPriority(priority, fn))
+            self.inFlight[key] = (task, priority)
+            task.add_done_callback(lambda done: self.settle(key, done))
+        else:
+            task, priority = flight
+            upstreamScheduler.promote(priority)
+        # Shielded so one cancelled waiter doesn't cancel the call for everyone else
+        return await asyncio.shield(task)
+
+    def settle(self, key, task):
+        flight = self.inFlight.get(key)
+        if flight is not None and flight[0] is task:
+            del self.inFlight[key]
+        # Mark the exception as retrieved even if every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+# Shared by every module that talks to the VLR API
+upstreamFlights = SingleFlight()
@@ -0,0 +1,114 @@
+# Startup pipeline: phase timing and command tree syncing.
+# Syncing is a slow, rate-limited call, so the tree's signature is hashed and kept next to the caches, and the
+# sync only happens when the hash changes. Set DEV_GUILD_IDS to sync to those guilds instead of globally (guild
+# commands update instantly, which is what you want while developing).
+# Imported first by main.py, so the "import" phase covers everything main.py pulls in.
+
+import time
+
+STARTED = time.perf_counter()  # taken before the imports below, which are part of the import phase
+
+import hashlib
+import json
+import os
+
+import discord
+
+from scripts.cacheFormat import atomicWrite
+from scripts.metrics import firstCommand, startupPhase
+
+CACHE_DIR = os.getenv("CACHE_DIR", ".")
+COMMAND_SYNC_FILE = os.path.join(CACHE_DIR, "command_sync.json")
+COMMAND_SYNC = os.getenv("COMMAND_SYNC", "auto")  # auto: only when the tree changed, always, or off
+DEV_GUILD_IDS = [int(guild) for guild in os.getenv("DEV_GUILD_IDS", "").split(",") if guild.strip()]
+
+class StartupTimer:
+    def __init__(self):
+        self.started = STARTED
+        self.last = self.started
+        self.phases = {}
+        self.disconnectedAt = None
+        self.servedOnce = False
+
+    def mark(self, phase):
+        # Sequential phases: the time since the previous mark is attributed to this one
+        now = time.perf_counter()
+        self.record(phase, now - self.last)
+        self.last = now
+
+    def record(self, phase, seconds):
+        self.phases[phase] = seconds
+        startupPhase.set(seconds, phase=phase)
+        print(f"🚦 {phase}: {seconds:.2f}s")
+
+    def disconnected(self):
+        # Keep the first disconnect until a command is served again
+        if self.disconnectedAt is None and self.servedOnce:
+            self.disconnectedAt = time.perf_counter()
+
+    def served(self):
+        now = time.perf_counter()
+        if not self.servedOnce:
+            self.servedOnce = True
+            firstCommand.set(now - self.started, start="cold")
+            print(f"🚦 First command served {now - self.started:.2f}s after start")
+        elif self.disconnectedAt is not None:
+            firstCommand.set(now - self.disconnectedAt, start="reconnect")
+            print(f"🚦 First command served {now - self.disconnectedAt:.2f}s after reconnecting")
+            self.disconnectedAt = None
+
+startupTimer = StartupTimer()
+
+def treeSignature(tree, applicationId, guild=None):
+    # Everything Discord stores about the commands, in a stable order
+    payload = sorted((command.to_dict(tree) for command in tree.get_commands(guild=guild)), key=lambda command: command["name"])
+    text = json.dumps({"application": applicationId, "commands": payload}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def loadSyncedSignatures(path=COMMAND_SYNC_FILE):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def saveSyncedSignatures(signatures, path=COMMAND_SYNC_FILE):
+    atomicWrite(path, json.dumps(signatures, indent=2, sort_keys=True).encode("utf-8"))
+
+async def syncCommands(bot, guildIds=DEV_GUILD_IDS, mode=COMMAND_SYNC):
+    # Returns the scopes that were synced; a scope whose signature is unchanged is skipped
+    if mode == "off":
+        return []
+    started = time.perf_counter()
+    if guildIds:
+        scopes = [discord.Object(id=guildId) for guildId in guildIds]
+        for guild in scopes:
+            bot.tree.copy_global_to(guild=guild)
+    else:
+        scopes = [None]
+
+    signatures = loadSyncedSignatures()
+    synced = []
+    for guild in scopes:
+        scope = "global" if guild is None else f"guild:{guild.id}"
+        signature = treeSignature(bot.tree, bot.application_id, guild)
+        if mode != "always" and signatures.get(scope) == signature:
+            print(f"Commands unchanged for {scope}, not syncing")
+            continue
+        try:
+            commands = await bot.tree.sync(guild=guild)
+        except Exception as e:
+            print(f"Error syncing commands for {scope}: {e}")
+            continue
+        print(f"Synced {len(commands)} command(s) for {scope}")
+        signatures[scope] = signature
+        synced.append(scope)
+
+    if synced:
+        try:
+            saveSyncedSignatures(signatures)
+        except OSError as e:
+            print(f"⚠️ Could not save the command sync state: {str(e)}")
+    # Runs alongside the other phases, so it is timed on its own
+    startupTimer.record("sync", time.perf_counter() - started)
+    return synced
@@ -1,117 +1,195 @@
 # Script to grab all team names from the VLR API and save them into a dictionary.
 
 import asyncio
-import aiohttp
-import time
+import hashlib
 import json
+import time
 import os
 
-CACHE_DIR = os.getenv("CACHE_DIR", ".")
-CACHE_FILE = os.path.join(CACHE_DIR, "team_cache.json")
-CACHE_EXPIRY = 86400  # 24 hours in seconds
+from scripts.nameIndex import NameIndex
+from scripts.cacheFormat import buildNameMappings, loadNameCache, saveNameCache
+from scripts.httpClient import API_BASE_URL, getSession
+from scripts.singleFlight import upstreamFlights
+from scripts.fetchPipeline import UNCHANGED, Fetched, FetchPipeline, UpstreamError
+from scripts.metrics import nameIndexSize
+from scripts.entityStore import entityStore
+from scripts.executors import runIo
 
-API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:5000")
+CACHE_DIR = os.getenv("CACHE_DIR", ".")
+CACHE_FILE = os.path.join(CACHE_DIR, "team_cache.bin")
+LEGACY_CACHE_FILE = os.path.join(CACHE_DIR, "team_cache.json")  # read as a fallback, migrated on load
+CACHE_EXPIRY = int(os.getenv("NAME_CACHE_EXPIRY", "3600"))  # 1 hour; conditional refreshes keep this cheap
 
 REGIONS = ['na', 'eu', 'ap', 'jp', 'br', 'oce', 'gc', 'la-s', 'la-n', 'oceania', 'mena']
 
+# Resident autocomplete index, replaced (never mutated) whenever the cache is loaded or refreshed
+_teamIndex = NameIndex([])
+_teamCacheTimestamp = 0
+
+def getTeamIndex():
+    return _teamIndex
+
+def getTeamCacheTimestamp():
+    return _teamCacheTimestamp
+
+async def setTeamIndex(nameList, timestamp):
+    global _teamIndex, _teamCacheTimestamp
+    # Built on a thread: from scratch the first time, after that by applying only the differences (an unchanged
+    # list keeps the current index)
+    if len(_teamIndex):
+        _teamIndex = await runIo(_teamIndex.updated, nameList)
+    else:
+        _teamIndex = await runIo(NameIndex, nameList)
+    _teamCacheTimestamp = timestamp
+    nameIndexSize.set(len(_teamIndex), kind="team")
+
+def projectTeams(teams):
+    # Only the fields the name cache needs are kept as the pipeline's per-region snapshot
+    return [{"id": team.get("id"), "name": team.get("name")} for team in teams]
+
+teamPipeline = FetchPipeline("teams", project=projectTeams)
+
 async def fetchTeamsByRegion(session, region):
-    url = f"{API_BASE_URL}/api/v1/teams?limit=all&region={region}"
+    # Overlapping refreshes share the in-flight request for a region instead of doubling up
+    return await upstreamFlights.do(
+        ("teams-region", region),
+        lambda: teamPipeline.fetch(region or "all", lambda: fetchTeamsByRegionUncoalesced(session, region))
+    )
+
+async def fetchTeamsByRegionUncoalesced(session, region):
+    key = region or "all"
+    url = f"{API_BASE_URL}/api/v1/teams?limit=all"
+    if region:
+        url += f"&region={region}"
     
-    try:
-        async with session.get(url) as response:
-            if response.status == 200:
-                data = await response.json()
-                return data.get("data", [])
-            else:
-                print(f"⚠️ Error fetching teams for region {region}: Status {response.status}")
-                return []
-    except Exception as e:
-        print(f"⚠️ Exception fetching teams for region {region}: {str(e)}")
-        return []
+    async with session.get(url, headers=teamPipeline.conditionalHeaders(key)) as response:
+        if response.status == 304:
+            return UNCHANGED
+        if response.status != 200:
+            raise UpstreamError(response.status)
+        body = await response.read()
 
-async def fetchAllTeamNames():
+    # Servers that ignore the validators still get caught by the content digest
+    digest = hashlib.blake2b(body, digest_size=16).digest()
+    if teamPipeline.isUnchanged(key, digest):
+        return Fetched(UNCHANGED, response.headers, digest)
+    return Fetched(json.loads(body).get("data", []), response.headers, digest)
 
+def collectTeams(all_region_results, currentIndex):
+    # Runs on a thread: dedupes every region's teams by ID
     teamNameMappings = {}
     teamsNameList = []
     seen_team_ids = set()
 
-    async with aiohttp.ClientSession() as session:
-        region_tasks = [fetchTeamsByRegion(session, region) for region in REGIONS]
-        all_region_results = await asyncio.gather(*region_tasks)
-
-        for i, teams in enumerate(all_region_results):
-            region = REGIONS[i]
-            print(f"Found {len(teams)} teams in region {region}")
+    for result in all_region_results:
+        for team in result.data or []:
+            team_id = team.get("id")
+            team_name = team.get("name")
             
-            for team in teams:
-                team_id = team.get("id")
-                team_name = team.get("name")
-                
-                # Only add if we haven't seen this team ID before
-                if team_id and team_name and team_id not in seen_team_ids:
-                    teamNameMappings[team_name.lower()] = team_id
-                    teamsNameList.append({"name": team_name, "id": team_id})
-                    seen_team_ids.add(team_id)
-        
-        try:
-            url = f"{API_BASE_URL}/api/v1/teams?limit=all"
-            async with session.get(url) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    main_teams = data.get("data", [])
-                    
-                    for team in main_teams:
-                        team_id = team.get("id")
-                        team_name = team.get("name")
-                        
-                        if team_id and team_name and team_id not in seen_team_ids:
-                            teamNameMappings[team_name.lower()] = team_id
-                            teamsNameList.append({"name": team_name, "id": team_id})
-                            seen_team_ids.add(team_id)
-        except Exception as e:
-            print(f"⚠️ Error fetching teams from main endpoint: {str(e)}")
-        
-        cache = {
-            "timestamp": time.time(),
-            "teamNameMappings": teamNameMappings,
-            "teamsNameList": teamsNameList
-        }
-
-        with open(CACHE_FILE, "w") as f:
-            json.dump(cache, f, indent=2)
-        
-        print(f"Fetched and cached {len(teamsNameList)} team names.")
-        return teamNameMappings, teamsNameList
+            # Only add if we haven't seen this team ID before
+            if team_id and team_name and team_id not in seen_team_ids:
+                teamNameMappings[team_name.lower()] = team_id
+                teamsNameList.append({"name": team_name, "id": team_id})
+                seen_team_ids.add(team_id)
+
+    # A region that failed with no snapshot to fall back on keeps its teams from the current cache
+    if any(result.data is None for result in all_region_results):
+        for team in currentIndex.liveEntries():
+            if team["id"] not in seen_team_ids:
+                teamNameMappings[team["name"].lower()] = team["id"]
+                teamsNameList.append(team)
+                seen_team_ids.add(team["id"])
+    return teamNameMappings, teamsNameList
+
+async def fetchAllTeamNames():
+    # Every region plus the unfiltered endpoint, which catches teams without a region
+    session = getSession()
+    region_tasks = [fetchTeamsByRegion(session, region) for region in REGIONS + [None]]
+    all_region_results = await asyncio.gather(*region_tasks)
+    teamPipeline.report(all_region_results)
+
+    if not any(result.data for result in all_region_results):
+        raise UpstreamError(0, "every team region failed, keeping the previous cache")
+
+    if len(getTeamIndex()) and all(result.ok and not result.changed for result in all_region_results):
+        return await touchTeamCache()
+
+    teamNameMappings, teamsNameList = await runIo(collectTeams, all_region_results, getTeamIndex())
+    
+    timestamp = time.time()
+    await runIo(saveNameCache, CACHE_FILE, LEGACY_CACHE_FILE, "teamsNameList", timestamp, teamsNameList)
+    
+    await setTeamIndex(teamsNameList, timestamp)
+
+    # Unchanged teams are skipped by the upsert, so this mostly costs a read per row
+    await entityStore.write(entityStore.upsertTeams, [
+        (team.get("id"), team.get("name"), None if result.key == "all" else result.key)
+        for result in all_region_results if result.changed
+        for team in result.data or []
+        if team.get("name")
+    ])
+
+    print(f"Fetched and cached {len(teamsNameList)} team names.")
+    return teamNameMappings, teamsNameList
+
+async def touchTeamCache():
+    # Nothing changed upstream: keep the index and only record that it is current
+    global _teamCacheTimestamp
+    timestamp = time.time()
+    teamsNameList = getTeamIndex().liveEntries()
+    await runIo(saveNameCache, CACHE_FILE, LEGACY_CACHE_FILE, "teamsNameList", timestamp, teamsNameList)
+    _teamCacheTimestamp = timestamp
+    print(f"Team names unchanged upstream ({len(teamsNameList)} cached).")
+    return await runIo(buildNameMappings, teamsNameList), teamsNameList
 
 async def getTeamMapping():
-    if os.path.exists(CACHE_FILE):
-        try:
-            with open(CACHE_FILE, "r") as f:
-                cache = json.load(f)
-                
-            # Check if cache is still valid
-            if time.time() - cache.get("timestamp", 0) < CACHE_EXPIRY:
-                return cache.get("teamNameMappings", {}), cache.get("teamsNameList", [])
-            else:
-                print("🔄 Cache expired, refreshing...")
-        except Exception as e:
-            print(f"⚠️ Error reading cache: {str(e)}")
+    cached = await runIo(loadNameCache, CACHE_FILE, LEGACY_CACHE_FILE, "teamsNameList")
+    if cached is not None:
+        timestamp, teamsNameList = cached
+
+        # Check if cache is still valid
+        if time.time() - timestamp < CACHE_EXPIRY:
+            await setTeamIndex(teamsNameList, timestamp)
+            return await runIo(buildNameMappings, teamsNameList), teamsNameList
+        else:
+            print("🔄 Cache expired, refreshing...")
     
     # Cache doesn't exist or is expired
     return await fetchAllTeamNames()
 
 def getCachedMappingSync():
-    if os.path.exists(CACHE_FILE):
-        try:
-            with open(CACHE_FILE, "r") as f:
-                cache = json.load(f)
-            return cache.get("teamNameMappings", {}), cache.get("teamsNameList", [])
-        except Exception:
-            return {}, []
-    return {}, []
-
-# Add this to your bot's startup routine
+    # Blocking; only for callers outside the event loop
+    cached = loadNameCache(CACHE_FILE, LEGACY_CACHE_FILE, "teamsNameList")
+    if cached is None:
+        return {}, []
+    _, teamsNameList = cached
+    return buildNameMappings(teamsNameList), teamsNameList
+
+async def loadTeamCache():
+    # Load whatever is on disk, expired or not, so autocomplete works before the first refresh
+    cached = await runIo(loadNameCache, CACHE_FILE, LEGACY_CACHE_FILE, "teamsNameList")
+    if cached is None:
+        return False
+
+    timestamp, teamsNameList = cached
+    await setTeamIndex(teamsNameList, timestamp)
+    return True
+
+async def reloadTeamCache():
+    # Pick up a newer cache written by another process (the elected refresher); True if the index was replaced
+    cached = await runIo(loadNameCache, CACHE_FILE, LEGACY_CACHE_FILE, "teamsNameList")
+    if cached is None or cached[0] <= _teamCacheTimestamp:
+        return False
+
+    timestamp, nameList = cached
+    await setTeamIndex(nameList, timestamp)
+    return True
+
+# Add this to your bot's startup routine. Refreshing is left to the refresh scheduler.
 async def initializeCache():
     print("🔄 Initializing team cache...")
-    await getTeamMapping()
+    if not await loadTeamCache():
+        print("⚠️ No team cache on disk yet, autocomplete will be empty until the first refresh")
+    elif time.time() - getTeamCacheTimestamp() >= CACHE_EXPIRY:
+        print("🔄 Team cache is stale, serving it until the background refresh completes")
     print("✅ Team cache initialized")
@@ -0,0 +1,269 @@
+# Central gate for every request to the VLR API.
+# Each endpoint class has its own token bucket, and one overall bucket covers all of them, so a refresh landing
+# in a busy hour can't push upstream into throttling us. Requests that find no token wait in priority lanes
+# (interactive, then prefetch, then background) and, within a lane, take turns by guild so one busy server
+# can't hold up everyone else.
+# The lane and guild come from the calling context: wrap work in `with upstreamLane(...)`; anything outside
+# one counts as background. Coalesced calls (single flights) run with a priority of their own, which is raised
+# when a more urgent caller joins them, so a click that joins a queued prefetch doesn't wait in the prefetch lane.
+
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from scripts.metrics import upstreamQueueDepth, upstreamQueueWait
+
+INTERACTIVE = "interactive"
+PREFETCH = "prefetch"
+BACKGROUND = "background"
+LANES = (INTERACTIVE, PREFETCH, BACKGROUND)  # highest priority first
+
+# Requests per second and burst size; a rate of 0 means no limit
+UPSTREAM_RATE = float(os.getenv("UPSTREAM_RATE", "60"))
+UPSTREAM_BURST = float(os.getenv("UPSTREAM_BURST", "120"))
+UPSTREAM_DETAIL_RATE = float(os.getenv("UPSTREAM_DETAIL_RATE", "50"))
+UPSTREAM_DETAIL_BURST = float(os.getenv("UPSTREAM_DETAIL_BURST", "100"))
+UPSTREAM_BULK_RATE = float(os.getenv("UPSTREAM_BULK_RATE", "5"))
+UPSTREAM_BULK_BURST = float(os.getenv("UPSTREAM_BULK_BURST", "24"))  # about two full name refreshes back to back
+
+ENDPOINT_LIMITS = {
+    "detail": (UPSTREAM_DETAIL_RATE, UPSTREAM_DETAIL_BURST),  # /teams/{id}, /players/{id}
+    "bulk": (UPSTREAM_BULK_RATE, UPSTREAM_BULK_BURST),  # limit=all name lists
+}
+
+class Priority:
+    # Lane and guild that requests made in one context queue under. Mutable, so promote() can move requests
+    # that are already waiting.
+    __slots__ = ("lane", "guild", "waiters")
+
+    def __init__(self, lane, guild=None):
+        self.lane = lane
+        self.guild = guild
+        self.waiters = set()  # queued, not yet granted
+
+_lane = ContextVar("upstreamLane", default=None)
+
+def currentPriority():
+    return _lane.get() or Priority(BACKGROUND)
+
+@contextmanager
+def upstreamPriority(priority):
+    # Tasks started inside the block (single-flight calls, hedges) inherit the priority
+    token = _lane.set(priority)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+def upstreamLane(lane, guild=None):
+    return upstreamPriority(Priority(lane, guild))
+
+def rank(lane):
+    return LANES.index(lane)
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def waitTime(self, now):
+        # Seconds until a token is available; 0 if one is available now
+        if self.rate <= 0:
+            return 0.0
+        self.refill(now)
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def take(self):
+        if self.rate > 0:
+            self.tokens -= 1
+
+class Waiter:
+    __slots__ = ("future", "endpoint", "priority", "lane", "guild", "queued")
+
+    def __init__(self, future, endpoint, priority, queued):
+        self.future = future
+        self.endpoint = endpoint
+        self.priority = priority
+        self.lane = priority.lane  # the queue it is in
+        self.guild = priority.guild
+        self.queued = queued
+
+class LaneStats:
+    __slots__ = ("granted", "waited", "maxWait")
+
+    def __init__(self):
+        self.granted = 0
+        self.waited = 0.0
+        self.maxWait = 0.0
+
+class UpstreamScheduler:
+    def __init__(self, rate=UPSTREAM_RATE, burst=UPSTREAM_BURST, limits=ENDPOINT_LIMITS):
+        self.total = TokenBucket(rate, burst)
+        self.buckets = {endpoint: TokenBucket(*limit) for endpoint, limit in limits.items()}
+        # lane -> guild -> waiting requests; dict order is the guilds' turn order
+        self.queues = {lane: {} for lane in LANES}
+        self.depth = dict.fromkeys(LANES, 0)
+        self.laneStats = {lane: LaneStats() for lane in LANES}
+        self.timer = None
+
+    def waitTime(self, endpoint, now):
+        bucket = self.buckets.get(endpoint)
+        wait = self.total.waitTime(now)
+        return max(wait, bucket.waitTime(now)) if bucket is not None else wait
+
+    def take(self, endpoint):
+        self.total.take()
+        bucket = self.buckets.get(endpoint)
+        if bucket is not None:
+            bucket.take()
+
+    async def acquire(self, endpoint):
+        # Returns once the request may go out; cancelling the caller gives up its place in the queue
+        priority = currentPriority()
+        waiter = Waiter(asyncio.get_running_loop().create_future(), endpoint, priority, time.monotonic())
+        priority.waiters.add(waiter)
+        self.enqueue(waiter)
+        self.dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            self.discard(waiter)
+            raise
+
+    def enqueue(self, waiter):
+        self.queues[waiter.lane].setdefault(waiter.guild, deque()).append(waiter)
+        self.setDepth(waiter.lane, 1)
+
+    def unqueue(self, waiter):
+        guilds = self.queues[waiter.lane]
+        queue = guilds.get(waiter.guild)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del guilds[waiter.guild]
+            self.setDepth(waiter.lane, -1)
+
+    def discard(self, waiter):
+        waiter.priority.waiters.discard(waiter)
+        if not waiter.future.cancelled():
+            return  # already granted and out of the queue
+        # dispatch() may have dropped it already
+        self.unqueue(waiter)
+
+    def promote(self, priority):
+        # Raise `priority` to the calling context's lane (and guild) if that is more urgent, moving its queued
+        # requests along. Used when a caller joins work that another, less urgent caller started.
+        current = currentPriority()
+        if rank(current.lane) >= rank(priority.lane):
+            return
+        priority.lane = current.lane
+        priority.guild = current.guild
+        for waiter in list(priority.waiters):
+            if waiter.future.done():
+                continue
+            self.unqueue(waiter)
+            waiter.lane = priority.lane
+            waiter.guild = priority.guild
+            self.enqueue(waiter)
+        self.dispatch()
+
+    def setDepth(self, lane, change):
+        self.depth[lane] += change
+        upstreamQueueDepth.set(self.depth[lane], lane=lane)
+
+    def dispatch(self):
+        # Grant tokens lane by lane, one request per guild per round. A request whose bucket is empty doesn't
+        # block requests for other endpoint classes behind it.
+        now = time.monotonic()
+        wake = None
+        for lane in LANES:
+            guilds = self.queues[lane]
+            granted = True
+            while guilds and granted:
+                granted = False
+                for guild in list(guilds):
+                    queue = guilds[guild]
+                    waiter = queue[0]
+                    if waiter.future.cancelled():
+                        # Its caller is gone but hasn't run discard() yet
+                        queue.popleft()
+                        if not queue:
+                            del guilds[guild]
+                        self.setDepth(lane, -1)
+                        waiter.priority.waiters.discard(waiter)
+                        granted = True
+                        continue
+                    wait = self.waitTime(waiter.endpoint, now)
+                    if wait > 0:
+                        wake = wait if wake is None else min(wake, wait)
+                        continue
+                    self.take(waiter.endpoint)
+                    queue.popleft()
+                    # Back of the line, behind the other guilds
+                    del guilds[guild]
+                    if queue:
+                        guilds[guild] = queue
+                    self.setDepth(lane, -1)
+                    waiter.priority.waiters.discard(waiter)
+                    self.record(waiter, now - waiter.queued)
+                    waiter.future.set_result(None)
+                    granted = True
+
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if wake is not None:
+            self.timer = asyncio.get_running_loop().call_later(wake, self.wakeUp)
+
+    def wakeUp(self):
+        self.timer = None
+        self.dispatch()
+
+    def record(self, waiter, waited):
+        stats = self.laneStats[waiter.lane]
+        stats.granted += 1
+        stats.waited += waited
+        stats.maxWait = max(stats.maxWait, waited)
+        upstreamQueueWait.observe(waited, lane=waiter.lane, endpoint=waiter.endpoint)
+
+    def stats(self):
+        now = time.monotonic()
+        result = {}
+        for lane in LANES:
+            stats = self.laneStats[lane]
+            oldest = min((queue[0].queued for queue in self.queues[lane].values()), default=None)
+            result[lane] = {
+                "queued": self.depth[lane],
+                "guilds_waiting": len(self.queues[lane]),
+                "oldest_wait_seconds": now - oldest if oldest is not None else 0.0,
+                "granted": stats.granted,
+                "mean_wait_seconds": stats.waited / stats.granted if stats.granted else 0.0,
+                "max_wait_seconds": stats.maxWait,
+            }
+        return result
+
+    def stop(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        for guilds in self.queues.values():
+            for queue in guilds.values():
+                for waiter in queue:
+                    waiter.future.cancel()
+                    waiter.priority.waiters.discard(waiter)
+            guilds.clear()
+        for lane in LANES:
+            self.depth[lane] = 0
+            upstreamQueueDepth.set(0, lane=lane)
+
+upstreamScheduler = UpstreamScheduler()
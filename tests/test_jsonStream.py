@@ -0,0 +1,65 @@
+# Chunk boundaries must never change what iterJsonArray yields: every payload is split at every byte offset.
+
+import asyncio
+import json
+import unittest
+
+from scripts.jsonStream import JsonStreamError, iterJsonArray
+
+PAYLOADS = [
+    '{"data":[1.5]}',
+    '{"data":[-1.5e10, 2E-3, 0, -0.25, 12345678901234567890]}',
+    '{"status":200,"data":[{"id":"7","rating":1.25},{"id":"8","rating":-0.5e1}],"size":2}',
+    '{"data":["plain", "esc\\"aped", "back\\\\slash", "\\u00e9\\n\\t", "\\ud83d\\ude00", "café 日本"]}',
+    '{"data":[true, false, null, [], {}, [1, [2.5, "x"]]]}',
+    '{ "meta" : {"n": 3.75} , "data" : [ 10 , 20.0 ] }',
+    '{"data":[]}',
+    '{}',
+]
+
+async def chunked(parts):
+    for part in parts:
+        yield part
+
+def collect(parts, key="data"):
+    async def run():
+        return [item async for item in iterJsonArray(chunked(parts), key)]
+    return asyncio.run(run())
+
+class IterJsonArrayTests(unittest.TestCase):
+    def expected(self, payload):
+        return json.loads(payload).get("data", [])
+
+    def test_whole_body(self):
+        for payload in PAYLOADS:
+            with self.subTest(payload=payload):
+                self.assertEqual(collect([payload.encode("utf-8")]), self.expected(payload))
+
+    def test_split_at_every_offset(self):
+        for payload in PAYLOADS:
+            body = payload.encode("utf-8")
+            for offset in range(1, len(body)):
+                with self.subTest(payload=payload, offset=offset):
+                    self.assertEqual(collect([body[:offset], body[offset:]]), self.expected(payload))
+
+    def test_one_byte_chunks(self):
+        for payload in PAYLOADS:
+            body = payload.encode("utf-8")
+            with self.subTest(payload=payload):
+                self.assertEqual(collect([body[i:i + 1] for i in range(len(body))]), self.expected(payload))
+
+    def test_empty_chunks_in_between(self):
+        self.assertEqual(collect([b'{"data":[1.', b"", b"5]}"]), [1.5])
+
+    def test_truncated_body(self):
+        for body in (b'{"data":[1.5', b'{"data":["abc', b'{"data":[1,'):
+            with self.subTest(body=body):
+                with self.assertRaises(ValueError):
+                    collect([body])
+
+    def test_malformed_separator(self):
+        with self.assertRaises(JsonStreamError):
+            collect([b'{"data":[1 2]}'])
+
+if __name__ == "__main__":
+    unittest.main()
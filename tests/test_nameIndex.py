@@ -0,0 +1,68 @@
+# An index derived through updated() must answer every query exactly like a fresh NameIndex over the same entries:
+# tombstoned positions can't take up room in any tier's candidate cap.
+
+import random
+import unittest
+
+from scripts.nameIndex import NameIndex
+
+def baseEntries():
+    rng = random.Random(7)
+    names = {f"Kaze Gaming {n}" for n in range(60)}
+    while len(names) < 1000:
+        words = ["".join(rng.choices("aeiouklmnrstgz", k=rng.randint(3, 7))).capitalize() for _ in range(rng.randint(1, 3))]
+        names.add(" ".join(words))
+    return [{"id": i + 1, "name": name} for i, name in enumerate(sorted(names))]
+
+def updatedEntries(entries):
+    # Rename most of the Kaze Gaming teams, drop a few others and add some new ones
+    kaze = [entry for entry in entries if entry["name"].startswith("Kaze Gaming")]
+    renamed = {entry["id"]: f"Renamed Club {k}" for k, entry in enumerate(kaze[:38])}
+    removed = {entry["id"] for entry in entries[:5]}
+    current = [
+        {"id": entry["id"], "name": renamed.get(entry["id"], entry["name"])}
+        for entry in entries if entry["id"] not in removed
+    ]
+    current += [{"id": 10000 + n, "name": f"Kaze Gaming New {n}"} for n in range(5)]
+    return current
+
+QUERIES = ["kaze gaming", "kaze gamng", "kzae gaming", "kaze", "gaming", "gam", "k", "ka", "renamed club", "club 1", "new", "ming 5"]
+
+class UpdatedIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.entries = baseEntries()
+        self.updated = NameIndex(self.entries).updated(updatedEntries(self.entries))
+        self.fresh = NameIndex(self.updated.liveEntries())
+
+    def assertSameResults(self, query):
+        with self.subTest(query=query):
+            self.assertEqual(
+                [entry["id"] for entry in self.updated.search(query)],
+                [entry["id"] for entry in self.fresh.search(query)],
+            )
+
+    def test_incremental(self):
+        # The change set is small enough to be merged rather than rebuilt
+        self.assertTrue(self.updated.dead)
+        self.assertEqual(len(self.updated), len(self.fresh))
+
+    def test_same_results_as_fresh_build(self):
+        for query in QUERIES:
+            self.assertSameResults(query)
+
+    def test_prefixes_and_typos(self):
+        rng = random.Random(3)
+        for entry in rng.sample(self.fresh.entries, 60):
+            name = entry["name"].lower()
+            for size in range(1, len(name) + 1):
+                self.assertSameResults(name[:size])
+            typo = list(name)
+            typo[rng.randrange(1, len(typo))] = "q"
+            self.assertSameResults("".join(typo))
+
+    def test_removed_names_are_gone(self):
+        ids = {entry["id"] for entry in self.updated.search("kaze gaming", 100)}
+        self.assertEqual(ids, {entry["id"] for entry in self.fresh.entries if "kaze gaming" in entry["name"].lower()})
+
+if __name__ == "__main__":
+    unittest.main()